@@ -6,7 +6,6 @@ Interfaz web moderna con soporte completo para videos embebidos de YouTube.
 
 import os
 import sys
-import re
 import threading
 import time
 import webbrowser
@@ -52,7 +51,8 @@ from download_youtube import (
     register_song_in_db, add_id3_tags,
     save_rejected_video, is_rejected_video, sanitize_filename,
     check_and_normalize_audio,
-    get_liked_videos_from_url, process_imported_mp3
+    get_liked_videos_from_url, process_imported_mp3, get_cookies_file,
+    _VIDEO_ID_IN_URL_RE
 )
 from download_quick import download_quick
 from query_db import show_statistics, search_songs
@@ -466,7 +466,7 @@ def download_direct():
     def download_thread():
         try:
             # Extraer video_id de la URL
-            match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11})', url)
+            match = _VIDEO_ID_IN_URL_RE.search(url)
             video_id = match.group(1) if match else None
             
             if not video_id:
@@ -560,8 +560,10 @@ def download_quick_endpoint():
     def quick_download_thread():
         import traceback
         try:
-            download_quick(url)
-            direct_download_tasks[task_id] = {'status': 'completed', 'file': ''}
+            if download_quick(url):
+                direct_download_tasks[task_id] = {'status': 'completed', 'file': ''}
+            else:
+                direct_download_tasks[task_id] = {'status': 'error', 'error': 'La descarga rápida falló'}
         except BaseException as e:
             tb = traceback.format_exc()
             err_msg = str(e)
@@ -1046,6 +1048,8 @@ def reload_config():
         
         # Recargar variables de entorno desde el mismo .env (junto al .exe o a app.py)
         load_dotenv(_get_config_dir() / '.env', override=True)
+        # YOUTUBE_COOKIES_FILE puede haber cambiado: volver a buscar las cookies
+        get_cookies_file.cache_clear()
         
         # Obtener nuevas rutas
         new_db_path = os.getenv('DB_PATH', None)
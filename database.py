@@ -6,12 +6,48 @@ Módulo de gestión de base de datos SQLite para el sistema de descarga de músi
 import sqlite3
 import os
 import sys
+import queue
 import threading
 import json
+from contextlib import contextmanager
+from functools import lru_cache
 from pathlib import Path
-from typing import Optional, Dict, List, Tuple
+from typing import Optional, Dict, List, Set, Tuple
 from datetime import datetime
 
+# Tiempo máximo (ms) que una conexión espera a que otra libere el bloqueo de escritura
+BUSY_TIMEOUT_MS = 5000
+
+# Número máximo de conexiones simultáneas por pool (escritura / lectura)
+WRITER_POOL_SIZE = 4
+READER_POOL_SIZE = 16
+
+# Validez (días) de las respuestas guardadas de fuentes externas de género:
+# las búsquedas sin resultado caducan antes porque pueden deberse a errores de red
+GENRE_LOOKUP_TTL_DAYS = 30
+GENRE_LOOKUP_MISS_TTL_DAYS = 1
+
+# Validez (días) de la información de videos de YouTube guardada por download_youtube
+VIDEO_INFO_TTL_DAYS = 7
+
+# Valores por consulta en los `IN (...)` por lotes
+SQL_IN_BATCH_SIZE = 500
+
+# Columnas de songs que update_song puede modificar
+_SONG_UPDATE_FIELDS = frozenset({
+    'title', 'artist', 'year', 'genre', 'decade', 'file_path',
+    'file_size', 'file_type', 'duration', 'thumbnail_url', 'description', 'download_source', 'bitrate_kbps'
+})
+# update_song_video_id además permite cambiar la URL
+_SONG_REMAP_FIELDS = _SONG_UPDATE_FIELDS | {'url'}
+
+
+@lru_cache(maxsize=128)
+def _build_update_sql(fields: Tuple[str, ...]) -> str:
+    """Devuelve (y cachea) el UPDATE de songs para la tupla ordenada de columnas."""
+    assignments = ''.join(f"{field} = ?, " for field in fields)
+    return f"UPDATE songs SET {assignments}updated_at = CURRENT_TIMESTAMP WHERE video_id = ?"
+
 
 def get_default_db_path() -> Path:
     """
@@ -121,126 +157,176 @@ class MusicDatabase:
                 db_path = Path.home() / '.youtube_music.db'
 
         self.db_path = Path(db_path)
-        # Usar threading.local() para tener una conexión por thread
-        self._local = threading.local()
-        self._lock = threading.Lock()
+        # Pools acotados de conexiones reutilizables (escritura y lectura por separado).
+        # Sustituyen a la conexión por thread: los threads de corta vida devuelven
+        # la conexión al pool en lugar de dejarla abierta al terminar.
+        # Sin lock a nivel de Python: SQLite en modo WAL ya serializa las escrituras
+        # y busy_timeout hace que un escritor espere en lugar de fallar con SQLITE_BUSY.
+        self._pools = {True: queue.LifoQueue(), False: queue.LifoQueue()}
+        self._pool_slots = {
+            True: threading.BoundedSemaphore(WRITER_POOL_SIZE),
+            False: threading.BoundedSemaphore(READER_POOL_SIZE),
+        }
         self._init_database()
     
-    def _get_connection(self):
+    def _create_connection(self) -> sqlite3.Connection:
+        """Crea una conexión nueva configurada con todos los PRAGMAs."""
+        # Usar check_same_thread=False para permitir uso desde diferentes threads
+        conn = sqlite3.connect(
+            str(self.db_path),
+            check_same_thread=False
+        )
+        conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
+        # Habilitar WAL mode para mejor concurrencia
+        conn.execute('PRAGMA journal_mode=WAL')
+        # En WAL, NORMAL no arriesga la integridad y evita un fsync en cada commit
+        # (solo se sincroniza en los checkpoints)
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.execute(f'PRAGMA busy_timeout={BUSY_TIMEOUT_MS}')
+        return conn
+    
+    @contextmanager
+    def checkout(self, write: bool = False):
         """
-        Obtiene una conexión a la base de datos.
-        Crea una conexión por thread para evitar problemas de concurrencia.
+        Toma prestada una conexión del pool y la devuelve al terminar.
+        Si todas las conexiones del pool están en uso, espera a que se libere una.
+        
+        Args:
+            write: True para usar el pool de escritura, False para el de lectura.
         """
-        # Obtener o crear conexión para el thread actual
-        if not hasattr(self._local, 'conn') or self._local.conn is None:
-            # Usar check_same_thread=False para permitir uso desde diferentes threads
-            self._local.conn = sqlite3.connect(
-                str(self.db_path),
-                check_same_thread=False
-            )
-            self._local.conn.row_factory = sqlite3.Row  # Permite acceso por nombre de columna
-            # Habilitar WAL mode para mejor concurrencia
-            self._local.conn.execute('PRAGMA journal_mode=WAL')
-        return self._local.conn
+        pool = self._pools[write]
+        slots = self._pool_slots[write]
+        slots.acquire()
+        try:
+            try:
+                conn = pool.get_nowait()
+            except queue.Empty:
+                conn = self._create_connection()
+            try:
+                yield conn
+            finally:
+                # No devolver al pool una transacción a medias
+                if conn.in_transaction:
+                    conn.rollback()
+                pool.put(conn)
+        finally:
+            slots.release()
     
     def _init_database(self):
         """Inicializa las tablas de la base de datos si no existen."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        # Tabla de canciones descargadas
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS songs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                video_id TEXT UNIQUE NOT NULL,
-                url TEXT NOT NULL,
-                title TEXT NOT NULL,
-                artist TEXT,
-                year TEXT,
-                genre TEXT,
-                decade TEXT,
-                file_path TEXT UNIQUE NOT NULL,
-                file_size INTEGER,
-                file_type TEXT,
-                duration REAL,
-                thumbnail_url TEXT,
-                description TEXT,
-                downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                download_source TEXT
-            )
-        ''')
-        
-        # Migraciones: añadir columnas si no existen (para bases de datos existentes)
-        try:
-            cursor.execute('ALTER TABLE songs ADD COLUMN download_source TEXT')
-        except sqlite3.OperationalError:
-            # La columna ya existe, no hacer nada
-            pass
-        
-        try:
-            cursor.execute('ALTER TABLE songs ADD COLUMN file_type TEXT')
-        except sqlite3.OperationalError:
-            # La columna ya existe, no hacer nada
-            pass
-        
-        try:
-            cursor.execute('ALTER TABLE songs ADD COLUMN bitrate_kbps INTEGER')
-        except sqlite3.OperationalError:
-            # La columna ya existe, no hacer nada
-            pass
-        
-        # Índices para búsquedas rápidas
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_id ON songs(video_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_artist ON songs(artist)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_genre ON songs(genre)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_year ON songs(year)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_path ON songs(file_path)')
-        
-        # Tabla de videos rechazados
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS rejected_videos (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                video_id TEXT UNIQUE NOT NULL,
-                url TEXT,
-                title TEXT,
-                rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                reason TEXT
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rejected_video_id ON rejected_videos(video_id)')
-        
-        # Tabla de historial de descargas (opcional, para estadísticas)
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS download_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                video_id TEXT NOT NULL,
-                action TEXT NOT NULL,  -- 'downloaded', 'rejected', 'skipped', 'failed'
-                timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                notes TEXT
-            )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_video_id ON download_history(video_id)')
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_timestamp ON download_history(timestamp)')
-        
-        # Tabla de caché para datos de videos y clasificaciones
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS video_cache (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                video_id TEXT UNIQUE NOT NULL,
-                video_info TEXT,  -- JSON con información del video
-                metadata TEXT,    -- JSON con metadatos extraídos
-                genre TEXT,       -- Género detectado
-                cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        with self.checkout(write=True) as conn:
+            cursor = conn.cursor()
+            
+            # Tabla de canciones descargadas
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS songs (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    video_id TEXT UNIQUE NOT NULL,
+                    url TEXT NOT NULL,
+                    title TEXT NOT NULL,
+                    artist TEXT,
+                    year TEXT,
+                    genre TEXT,
+                    decade TEXT,
+                    file_path TEXT UNIQUE NOT NULL,
+                    file_size INTEGER,
+                    file_type TEXT,
+                    duration REAL,
+                    thumbnail_url TEXT,
+                    description TEXT,
+                    downloaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    download_source TEXT
+                )
+            ''')
+            
+            # Migraciones: añadir columnas si no existen (para bases de datos existentes)
+            try:
+                cursor.execute('ALTER TABLE songs ADD COLUMN download_source TEXT')
+            except sqlite3.OperationalError:
+                # La columna ya existe, no hacer nada
+                pass
+            
+            try:
+                cursor.execute('ALTER TABLE songs ADD COLUMN file_type TEXT')
+            except sqlite3.OperationalError:
+                # La columna ya existe, no hacer nada
+                pass
+            
+            try:
+                cursor.execute('ALTER TABLE songs ADD COLUMN bitrate_kbps INTEGER')
+            except sqlite3.OperationalError:
+                # La columna ya existe, no hacer nada
+                pass
+            
+            # Índices para búsquedas rápidas
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_video_id ON songs(video_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_artist ON songs(artist)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_genre ON songs(genre)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_year ON songs(year)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_file_path ON songs(file_path)')
+            
+            # Tabla de videos rechazados
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS rejected_videos (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    video_id TEXT UNIQUE NOT NULL,
+                    url TEXT,
+                    title TEXT,
+                    rejected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    reason TEXT
+                )
+            ''')
+            
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_rejected_video_id ON rejected_videos(video_id)')
+            
+            # Tabla de historial de descargas (opcional, para estadísticas)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS download_history (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    video_id TEXT NOT NULL,
+                    action TEXT NOT NULL,  -- 'downloaded', 'rejected', 'skipped', 'failed'
+                    timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    notes TEXT
+                )
+            ''')
+            
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_video_id ON download_history(video_id)')
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_history_timestamp ON download_history(timestamp)')
+            
+            # Tabla de caché para datos de videos y clasificaciones
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS video_cache (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    video_id TEXT UNIQUE NOT NULL,
+                    video_info TEXT,  -- JSON con información del video
+                    metadata TEXT,    -- JSON con metadatos extraídos
+                    genre TEXT,       -- Género detectado
+                    cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,  -- Fecha de video_info
+                    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                )
+            ''')
+            
+            cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_video_id ON video_cache(video_id)')
+            
+            # Caché de respuestas de fuentes externas de género (Last.fm, MusicBrainz...)
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS genre_lookup_cache (
+                    source TEXT NOT NULL,
+                    artist TEXT NOT NULL,
+                    track TEXT NOT NULL,
+                    genre TEXT,       -- NULL = la fuente no encontró género
+                    cached_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    PRIMARY KEY (source, artist, track)
+                )
+            ''')
+            # Purgar respuestas caducadas para que la tabla no crezca indefinidamente
+            cursor.execute(
+                "DELETE FROM genre_lookup_cache WHERE cached_at <= datetime('now', ?)",
+                (f'-{GENRE_LOOKUP_TTL_DAYS} days',)
             )
-        ''')
-        
-        cursor.execute('CREATE INDEX IF NOT EXISTS idx_cache_video_id ON video_cache(video_id)')
-        
-        conn.commit()
+            
+            conn.commit()
     
     def add_song(self, video_id: str, url: str, title: str, file_path: str,
                  artist: Optional[str] = None, year: Optional[str] = None,
@@ -255,8 +341,7 @@ class MusicDatabase:
         Returns:
             True si se añadió correctamente, False si ya existe.
         """
-        with self._lock:  # Proteger operaciones de escritura
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             try:
@@ -304,29 +389,17 @@ class MusicDatabase:
         if not kwargs:
             return False
         
-        with self._lock:  # Proteger operaciones de escritura
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
-            # Construir query de actualización
-            allowed_fields = ['title', 'artist', 'year', 'genre', 'decade', 'file_path',
-                             'file_size', 'file_type', 'duration', 'thumbnail_url', 'description', 'download_source', 'bitrate_kbps']
-            
-            updates = []
-            values = []
-            
-            for key, value in kwargs.items():
-                if key in allowed_fields:
-                    updates.append(f"{key} = ?")
-                    values.append(value)
-            
-            if not updates:
+            # Construir query de actualización (cacheada por combinación de columnas)
+            fields = tuple(sorted(key for key in kwargs if key in _SONG_UPDATE_FIELDS))
+            if not fields:
                 return False
             
-            updates.append("updated_at = CURRENT_TIMESTAMP")
+            values = [kwargs[field] for field in fields]
             values.append(video_id)
-            
-            query = f"UPDATE songs SET {', '.join(updates)} WHERE video_id = ?"
+            query = _build_update_sql(fields)
             
             try:
                 cursor.execute(query, values)
@@ -347,26 +420,15 @@ class MusicDatabase:
             new_video_id: Nuevo video ID (ej: video_id real de YouTube)
             **kwargs: Campos adicionales a actualizar
         """
-        with self._lock:
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
-            # Construir query de actualización
-            allowed_fields = ['url', 'title', 'artist', 'year', 'genre', 'decade', 'file_path',
-                             'file_size', 'file_type', 'duration', 'thumbnail_url', 'description', 'download_source', 'bitrate_kbps']
-            
-            updates = ['video_id = ?']
+            # Construir query de actualización (cacheada por combinación de columnas)
+            fields = ('video_id',) + tuple(sorted(key for key in kwargs if key in _SONG_REMAP_FIELDS))
             values = [new_video_id]
-            
-            for key, value in kwargs.items():
-                if key in allowed_fields:
-                    updates.append(f"{key} = ?")
-                    values.append(value)
-            
-            updates.append("updated_at = CURRENT_TIMESTAMP")
+            values.extend(kwargs[field] for field in fields[1:])
             values.append(old_video_id)
-            
-            query = f"UPDATE songs SET {', '.join(updates)} WHERE video_id = ?"
+            query = _build_update_sql(fields)
             
             try:
                 cursor.execute(query, values)
@@ -385,27 +447,68 @@ class MusicDatabase:
     
     def get_song_by_video_id(self, video_id: str) -> Optional[Dict]:
         """Obtiene una canción por su video_id."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM songs WHERE video_id = ?', (video_id,))
+            row = cursor.fetchone()
+            
+            if row:
+                return dict(row)
+            return None
+    
+    def get_songs_by_video_ids(self, video_ids: List[str]) -> Dict[str, Dict]:
+        """
+        Obtiene de una vez las canciones de varios video_id (p. ej. toda una playlist).
         
-        cursor.execute('SELECT * FROM songs WHERE video_id = ?', (video_id,))
-        row = cursor.fetchone()
+        Returns:
+            Diccionario video_id -> datos de la canción, solo con los que existen
+        """
+        songs = {}
+        ids = list(dict.fromkeys(video_ids))
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            # Por lotes para no superar el límite de parámetros de SQLite
+            for start in range(0, len(ids), SQL_IN_BATCH_SIZE):
+                batch = ids[start:start + SQL_IN_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                cursor.execute(f'SELECT * FROM songs WHERE video_id IN ({placeholders})', batch)
+                for row in cursor.fetchall():
+                    songs.setdefault(row['video_id'], dict(row))
+        return songs
+    
+    def get_rejected_ids(self, video_ids: List[str]) -> Set[str]:
+        """
+        Devuelve, de una vez, cuáles de estos video_id están en la lista de rechazados.
         
-        if row:
-            return dict(row)
-        return None
+        Returns:
+            Conjunto con los video_id rechazados
+        """
+        rejected = set()
+        ids = list(dict.fromkeys(video_ids))
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            # Por lotes para no superar el límite de parámetros de SQLite
+            for start in range(0, len(ids), SQL_IN_BATCH_SIZE):
+                batch = ids[start:start + SQL_IN_BATCH_SIZE]
+                placeholders = ','.join('?' * len(batch))
+                cursor.execute(f'SELECT video_id FROM rejected_videos WHERE video_id IN ({placeholders})', batch)
+                rejected.update(row[0] for row in cursor.fetchall())
+        return rejected
     
     def get_song_by_file_path(self, file_path: str) -> Optional[Dict]:
         """Obtiene una canción por su ruta de archivo."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT * FROM songs WHERE file_path = ?', (str(file_path),))
-        row = cursor.fetchone()
-        
-        if row:
-            return dict(row)
-        return None
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT * FROM songs WHERE file_path = ?', (str(file_path),))
+            row = cursor.fetchone()
+            
+            if row:
+                return dict(row)
+            return None
     
     def find_song(self, artist: Optional[str] = None, title: Optional[str] = None,
                   video_id: Optional[str] = None) -> List[Dict]:
@@ -415,31 +518,58 @@ class MusicDatabase:
         Returns:
             Lista de canciones que coinciden.
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        conditions = []
-        params = []
-        
-        if video_id:
-            conditions.append("video_id = ?")
-            params.append(video_id)
-        
-        if artist:
-            conditions.append("artist LIKE ?")
-            params.append(f"%{artist}%")
-        
-        if title:
-            conditions.append("title LIKE ?")
-            params.append(f"%{title}%")
-        
-        if not conditions:
-            return []
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            conditions = []
+            params = []
+            
+            if video_id:
+                conditions.append("video_id = ?")
+                params.append(video_id)
+            
+            if artist:
+                conditions.append("artist LIKE ?")
+                params.append(f"%{artist}%")
+            
+            if title:
+                conditions.append("title LIKE ?")
+                params.append(f"%{title}%")
+            
+            if not conditions:
+                return []
+            
+            query = f"SELECT * FROM songs WHERE {' AND '.join(conditions)}"
+            cursor.execute(query, params)
+            
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_artist_top_genre(self, artist: str) -> Optional[str]:
+        """
+        Devuelve el género más frecuente entre las canciones del artista
+        (ignorando 'Sin Clasificar' y 'Unknown'), contado directamente en SQLite.
         
-        query = f"SELECT * FROM songs WHERE {' AND '.join(conditions)}"
-        cursor.execute(query, params)
+        Args:
+            artist: Nombre del artista (coincidencia parcial, como find_song)
         
-        return [dict(row) for row in cursor.fetchall()]
+        Returns:
+            Género más común o None si el artista no tiene canciones clasificadas
+        """
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            # En caso de empate gana el género de la canción más antigua
+            cursor.execute('''
+                SELECT genre FROM songs
+                WHERE artist LIKE ? AND genre IS NOT NULL AND genre != ''
+                  AND lower(genre) NOT IN ('sin clasificar', 'unknown')
+                GROUP BY genre
+                ORDER BY COUNT(*) DESC, MIN(id)
+                LIMIT 1
+            ''', (f"%{artist}%",))
+            row = cursor.fetchone()
+        
+        return row[0] if row else None
     
     def song_exists(self, video_id: Optional[str] = None, 
                    artist: Optional[str] = None, 
@@ -470,8 +600,7 @@ class MusicDatabase:
     def add_rejected_video(self, video_id: str, url: Optional[str] = None,
                           title: Optional[str] = None, reason: Optional[str] = None) -> bool:
         """Añade un video a la lista de rechazados."""
-        with self._lock:  # Proteger operaciones de escritura
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             try:
@@ -494,12 +623,18 @@ class MusicDatabase:
                 return False
     
     def is_rejected(self, video_id: str) -> bool:
-        """Verifica si un video está rechazado."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
+        """
+        Verifica si un video está rechazado.
         
-        cursor.execute('SELECT 1 FROM rejected_videos WHERE video_id = ?', (video_id,))
-        return cursor.fetchone() is not None
+        Se consulta SQLite cada vez (búsqueda por idx_rejected_video_id): varias
+        instancias de MusicDatabase comparten el archivo, y una copia en memoria no
+        vería los cambios hechos desde otra.
+        """
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT 1 FROM rejected_videos WHERE video_id = ?', (video_id,))
+            return cursor.fetchone() is not None
     
     def get_all_rejected_videos(self, limit: Optional[int] = None) -> List[Dict]:
         """
@@ -508,15 +643,15 @@ class MusicDatabase:
         Args:
             limit: Número máximo de resultados
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        query = "SELECT * FROM rejected_videos ORDER BY rejected_at DESC"
-        if limit:
-            query += f" LIMIT {limit}"
-        
-        cursor.execute(query)
-        return [dict(row) for row in cursor.fetchall()]
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            query = "SELECT * FROM rejected_videos ORDER BY rejected_at DESC"
+            if limit:
+                query += f" LIMIT {limit}"
+            
+            cursor.execute(query)
+            return [dict(row) for row in cursor.fetchall()]
     
     def remove_rejected_video(self, video_id: str) -> bool:
         """
@@ -528,8 +663,7 @@ class MusicDatabase:
         Returns:
             True si se eliminó correctamente, False si no se encontró.
         """
-        with self._lock:  # Proteger operaciones de escritura
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             try:
@@ -565,73 +699,73 @@ class MusicDatabase:
             genre: Filtrar por género
             decade: Filtrar por década
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        conditions = []
-        params = []
-        
-        if genre:
-            conditions.append("genre = ?")
-            params.append(genre)
-        
-        if decade:
-            conditions.append("decade = ?")
-            params.append(decade)
-        
-        query = "SELECT * FROM songs"
-        if conditions:
-            query += " WHERE " + " AND ".join(conditions)
-        
-        query += " ORDER BY downloaded_at DESC"
-        
-        if limit:
-            query += f" LIMIT {limit}"
-        
-        cursor.execute(query, params)
-        return [dict(row) for row in cursor.fetchall()]
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            conditions = []
+            params = []
+            
+            if genre:
+                conditions.append("genre = ?")
+                params.append(genre)
+            
+            if decade:
+                conditions.append("decade = ?")
+                params.append(decade)
+            
+            query = "SELECT * FROM songs"
+            if conditions:
+                query += " WHERE " + " AND ".join(conditions)
+            
+            query += " ORDER BY downloaded_at DESC"
+            
+            if limit:
+                query += f" LIMIT {limit}"
+            
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
     
     def get_statistics(self) -> Dict:
         """Obtiene estadísticas de la base de datos."""
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        stats = {}
-        
-        # Total de canciones
-        cursor.execute('SELECT COUNT(*) FROM songs')
-        stats['total_songs'] = cursor.fetchone()[0]
-        
-        # Canciones por género
-        cursor.execute('''
-            SELECT genre, COUNT(*) as count 
-            FROM songs 
-            WHERE genre IS NOT NULL 
-            GROUP BY genre 
-            ORDER BY count DESC
-        ''')
-        stats['by_genre'] = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # Canciones por década
-        cursor.execute('''
-            SELECT decade, COUNT(*) as count 
-            FROM songs 
-            WHERE decade IS NOT NULL 
-            GROUP BY decade 
-            ORDER BY decade DESC
-        ''')
-        stats['by_decade'] = {row[0]: row[1] for row in cursor.fetchall()}
-        
-        # Total de rechazados
-        cursor.execute('SELECT COUNT(*) FROM rejected_videos')
-        stats['rejected_count'] = cursor.fetchone()[0]
-        
-        # Tamaño total de archivos
-        cursor.execute('SELECT SUM(file_size) FROM songs WHERE file_size IS NOT NULL')
-        result = cursor.fetchone()[0]
-        stats['total_size_bytes'] = result if result else 0
-        
-        return stats
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            stats = {}
+            
+            # Total de canciones
+            cursor.execute('SELECT COUNT(*) FROM songs')
+            stats['total_songs'] = cursor.fetchone()[0]
+            
+            # Canciones por género
+            cursor.execute('''
+                SELECT genre, COUNT(*) as count 
+                FROM songs 
+                WHERE genre IS NOT NULL 
+                GROUP BY genre 
+                ORDER BY count DESC
+            ''')
+            stats['by_genre'] = {row[0]: row[1] for row in cursor.fetchall()}
+            
+            # Canciones por década
+            cursor.execute('''
+                SELECT decade, COUNT(*) as count 
+                FROM songs 
+                WHERE decade IS NOT NULL 
+                GROUP BY decade 
+                ORDER BY decade DESC
+            ''')
+            stats['by_decade'] = {row[0]: row[1] for row in cursor.fetchall()}
+            
+            # Total de rechazados
+            cursor.execute('SELECT COUNT(*) FROM rejected_videos')
+            stats['rejected_count'] = cursor.fetchone()[0]
+            
+            # Tamaño total de archivos
+            cursor.execute('SELECT SUM(file_size) FROM songs WHERE file_size IS NOT NULL')
+            result = cursor.fetchone()[0]
+            stats['total_size_bytes'] = result if result else 0
+            
+            return stats
     
     def delete_song(self, video_id: str) -> Optional[Dict]:
         """
@@ -644,8 +778,7 @@ class MusicDatabase:
             Diccionario con los datos de la canción eliminada (incluyendo file_path) si existe,
             None si no se encontró.
         """
-        with self._lock:  # Proteger operaciones de escritura
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             # Primero obtener los datos de la canción antes de eliminarla
@@ -670,28 +803,35 @@ class MusicDatabase:
                 print(f"Error al eliminar canción: {e}")
                 return None
     
-    def get_cached_video_info(self, video_id: str) -> Optional[Dict]:
+    def get_cached_video_info(self, video_id: str, max_age_days: Optional[int] = None) -> Optional[Dict]:
         """
         Obtiene la información del video desde la caché.
         
         Args:
             video_id: ID del video de YouTube
+            max_age_days: Antigüedad máxima de la información (None = sin límite)
         
         Returns:
             Diccionario con información del video o None si no está en caché
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT video_info FROM video_cache WHERE video_id = ?', (video_id,))
-        row = cursor.fetchone()
-        
-        if row and row[0]:
-            try:
-                return json.loads(row[0])
-            except json.JSONDecodeError:
-                return None
-        return None
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            if max_age_days is None:
+                cursor.execute('SELECT video_info FROM video_cache WHERE video_id = ?', (video_id,))
+            else:
+                cursor.execute('''
+                    SELECT video_info FROM video_cache
+                    WHERE video_id = ? AND cached_at > datetime('now', ?)
+                ''', (video_id, f'-{max_age_days} days'))
+            row = cursor.fetchone()
+            
+            if row and row[0]:
+                try:
+                    return json.loads(row[0])
+                except json.JSONDecodeError:
+                    return None
+            return None
     
     def get_cached_metadata(self, video_id: str) -> Optional[Dict]:
         """
@@ -703,18 +843,18 @@ class MusicDatabase:
         Returns:
             Diccionario con metadatos o None si no está en caché
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT metadata FROM video_cache WHERE video_id = ?', (video_id,))
-        row = cursor.fetchone()
-        
-        if row and row[0]:
-            try:
-                return json.loads(row[0])
-            except json.JSONDecodeError:
-                return None
-        return None
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT metadata FROM video_cache WHERE video_id = ?', (video_id,))
+            row = cursor.fetchone()
+            
+            if row and row[0]:
+                try:
+                    return json.loads(row[0])
+                except json.JSONDecodeError:
+                    return None
+            return None
     
     def get_cached_genre(self, video_id: str) -> Optional[str]:
         """
@@ -726,15 +866,15 @@ class MusicDatabase:
         Returns:
             Género como string o None si no está en caché
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('SELECT genre FROM video_cache WHERE video_id = ?', (video_id,))
-        row = cursor.fetchone()
-        
-        if row and row[0]:
-            return row[0]
-        return None
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('SELECT genre FROM video_cache WHERE video_id = ?', (video_id,))
+            row = cursor.fetchone()
+            
+            if row and row[0]:
+                return row[0]
+            return None
     
     def set_cached_video_info(self, video_id: str, video_info: Dict) -> bool:
         """
@@ -747,18 +887,18 @@ class MusicDatabase:
         Returns:
             True si se guardó correctamente
         """
-        with self._lock:
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             try:
                 video_info_json = json.dumps(video_info, default=str)
                 
                 cursor.execute('''
-                    INSERT INTO video_cache (video_id, video_info, updated_at)
-                    VALUES (?, ?, CURRENT_TIMESTAMP)
+                    INSERT INTO video_cache (video_id, video_info, cached_at, updated_at)
+                    VALUES (?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
                     ON CONFLICT(video_id) DO UPDATE SET
                         video_info = excluded.video_info,
+                        cached_at = CURRENT_TIMESTAMP,
                         updated_at = CURRENT_TIMESTAMP
                 ''', (video_id, video_info_json))
                 
@@ -780,8 +920,7 @@ class MusicDatabase:
         Returns:
             True si se guardó correctamente
         """
-        with self._lock:
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             try:
@@ -813,8 +952,7 @@ class MusicDatabase:
         Returns:
             True si se guardó correctamente
         """
-        with self._lock:
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             try:
@@ -843,37 +981,99 @@ class MusicDatabase:
         Returns:
             Diccionario con 'video_info', 'metadata', 'genre' o None si no está en caché
         """
-        conn = self._get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            SELECT video_info, metadata, genre 
-            FROM video_cache 
-            WHERE video_id = ?
-        ''', (video_id,))
-        row = cursor.fetchone()
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT video_info, metadata, genre 
+                FROM video_cache 
+                WHERE video_id = ?
+            ''', (video_id,))
+            row = cursor.fetchone()
+            
+            if not row:
+                return None
+            
+            result = {}
+            
+            if row[0]:  # video_info
+                try:
+                    result['video_info'] = json.loads(row[0])
+                except json.JSONDecodeError:
+                    pass
+            
+            if row[1]:  # metadata
+                try:
+                    result['metadata'] = json.loads(row[1])
+                except json.JSONDecodeError:
+                    pass
+            
+            if row[2]:  # genre
+                result['genre'] = row[2]
+            
+            return result if result else None
+    
+    def get_cached_genre_lookup(self, source: str, artist: str, track: str,
+                                max_age_days: int = GENRE_LOOKUP_TTL_DAYS,
+                                miss_max_age_days: int = GENRE_LOOKUP_MISS_TTL_DAYS) -> Tuple[bool, Optional[str]]:
+        """
+        Obtiene la respuesta guardada de una fuente externa de género.
         
-        if not row:
-            return None
+        Args:
+            source: Nombre de la fuente (p. ej. 'lastfm')
+            artist: Artista consultado
+            track: Canción consultada
+            max_age_days: Antigüedad máxima de un género encontrado
+            miss_max_age_days: Antigüedad máxima de una búsqueda sin resultado
         
-        result = {}
+        Returns:
+            (encontrado_en_cache, género). El género puede ser None si la fuente
+            ya se consultó y no devolvió nada.
+        """
+        with self.checkout(write=False) as conn:
+            cursor = conn.cursor()
+            
+            cursor.execute('''
+                SELECT genre FROM genre_lookup_cache
+                WHERE source = ? AND artist = ? AND track = ?
+                  AND cached_at > datetime('now', CASE WHEN genre IS NULL THEN ? ELSE ? END)
+            ''', (source, artist.strip().lower(), track.strip().lower(),
+                  f'-{miss_max_age_days} days', f'-{max_age_days} days'))
+            row = cursor.fetchone()
+            
+            if row is None:
+                return False, None
+            return True, row[0]
+    
+    def set_cached_genre_lookup(self, source: str, artist: str, track: str,
+                                genre: Optional[str]) -> bool:
+        """
+        Guarda la respuesta de una fuente externa de género (también si no encontró nada).
         
-        if row[0]:  # video_info
-            try:
-                result['video_info'] = json.loads(row[0])
-            except json.JSONDecodeError:
-                pass
+        Args:
+            source: Nombre de la fuente (p. ej. 'lastfm')
+            artist: Artista consultado
+            track: Canción consultada
+            genre: Género devuelto o None
         
-        if row[1]:  # metadata
+        Returns:
+            True si se guardó correctamente
+        """
+        with self.checkout(write=True) as conn:
+            cursor = conn.cursor()
+            
             try:
-                result['metadata'] = json.loads(row[1])
-            except json.JSONDecodeError:
-                pass
-        
-        if row[2]:  # genre
-            result['genre'] = row[2]
-        
-        return result if result else None
+                cursor.execute('''
+                    INSERT OR REPLACE INTO genre_lookup_cache (source, artist, track, genre, cached_at)
+                    VALUES (?, ?, ?, ?, CURRENT_TIMESTAMP)
+                ''', (source, artist.strip().lower(), track.strip().lower(), genre))
+                
+                conn.commit()
+                return True
+            except Exception as e:
+                conn.rollback()
+                print(f"Error al guardar consulta de género en caché: {e}")
+                return False
     
     def clear_cache(self, video_id: Optional[str] = None) -> bool:
         """
@@ -885,8 +1085,7 @@ class MusicDatabase:
         Returns:
             True si se limpió correctamente
         """
-        with self._lock:
-            conn = self._get_connection()
+        with self.checkout(write=True) as conn:
             cursor = conn.cursor()
             
             try:
@@ -894,6 +1093,7 @@ class MusicDatabase:
                     cursor.execute('DELETE FROM video_cache WHERE video_id = ?', (video_id,))
                 else:
                     cursor.execute('DELETE FROM video_cache')
+                    cursor.execute('DELETE FROM genre_lookup_cache')
                 
                 conn.commit()
                 return True
@@ -903,10 +1103,14 @@ class MusicDatabase:
                 return False
     
     def close(self):
-        """Cierra la conexión a la base de datos del thread actual."""
-        if hasattr(self._local, 'conn') and self._local.conn:
-            self._local.conn.close()
-            self._local.conn = None
+        """Cierra las conexiones libres de los pools."""
+        for pool in self._pools.values():
+            while True:
+                try:
+                    conn = pool.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
     
     def __enter__(self):
         """Context manager entry."""
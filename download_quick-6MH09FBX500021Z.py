@@ -8,58 +8,185 @@ Usa la misma lógica robusta que la app (get_video_info + cascada de formatos).
 import os
 import sys
 import re
+import itertools
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
-import yt_dlp
+from typing import Dict, List, Optional, Tuple
+from yt_dlp.utils import YoutubeDLError
 from dotenv import load_dotenv
+from download_youtube import get_video_info, get_cookies_file, create_ydl, close_ydl
 
 load_dotenv()
 
 MUSIC_FOLDER = os.getenv('MUSIC_FOLDER', os.path.expanduser('~/Music'))
+# Carpeta de destino resuelta y creada una sola vez (no en cada descarga)
+MUSIC_PATH = Path(MUSIC_FOLDER)
+_music_path_ready = False
+
+
+def _ensure_music_path():
+    """Crea MUSIC_PATH la primera vez; lanza OSError si no se puede."""
+    global _music_path_ready
+    if not _music_path_ready:
+        MUSIC_PATH.mkdir(parents=True, exist_ok=True)
+        _music_path_ready = True
+
+
+# app.py e ide.py importan este módulo al arrancar: una carpeta inaccesible
+# (disco sin montar, sin permisos) no debe impedirlo; se reintenta al descargar
+try:
+    _ensure_music_path()
+except OSError:
+    pass
+
+# Descargas simultáneas por defecto en modo lote
+MAX_PARALLEL_DOWNLOADS = 4
+# Fragmentos descargados en paralelo dentro de un mismo video (formatos HLS/DASH)
+FRAGMENT_WORKERS = int(os.getenv('YDL_FRAG_WORKERS', '4'))
+
+# Si aria2c está instalado, se usa para descargas HTTP de un solo fichero con varias
+# conexiones (peticiones Range) en paralelo. Los formatos fragmentados (HLS/DASH)
+# siguen con el descargador nativo y concurrent_fragment_downloads.
+# Con aria2c el progreso lo muestra aria2c; progress_hook solo recibe 'finished'.
+HAS_ARIA2C = shutil.which('aria2c') is not None
+ARIA2C_OPTS = {
+    'external_downloader': {'http': 'aria2c'},
+    'external_downloader_args': {'aria2c': ['-x', '16', '-k', '1M', '--console-log-level=warn']},
+} if HAS_ARIA2C else {}
+
+# Evita que las líneas de progreso de descargas simultáneas se mezclen
+_stdout_lock = threading.Lock()
+
+# Patrones de sanitize_filename compilados una sola vez
+_INVALID_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*]')
+_WHITESPACE_RUN = re.compile(r'\s+')
+
+# Unidades binarias de format_size y su divisor (1024^i)
+_SIZE_UNITS = ('B', 'KiB', 'MiB', 'GiB', 'TiB')
+_SIZE_DIVISORS = tuple(1 << (10 * i) for i in range(len(_SIZE_UNITS)))
+
+# Clasificación de errores de descarga en la cascada de formatos
+ERROR_UNAVAILABLE = 'unavailable'  # Video no disponible/privado: no insistir con más formatos
+ERROR_OTHER = 'other'              # Formato no disponible u otro error: probar el siguiente intento
+_UNAVAILABLE_ERROR_RE = re.compile(r'Video unavailable|Private video')
+
+# Cascada de formatos (igual que download_audio) para vídeos con formatos limitados
+FORMAT_ATTEMPTS = (
+    'bestaudio/best/worst',
+    'bestaudio/best',
+    'best/worst',
+    'best[height<=720]/best',
+    'worst[ext=mp4]/worst',
+)
 
 
 def sanitize_filename(filename: str) -> str:
     """Limpia el nombre de archivo para que sea válido en el sistema de archivos."""
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-    filename = re.sub(r'\s+', ' ', filename)
-    if len(filename) > 100:
-        filename = filename[:100]
-    return filename.strip()
+    filename = _WHITESPACE_RUN.sub(' ', _INVALID_FILENAME_CHARS.sub('', filename))
+    return filename[:100].strip()
+
+
+def format_size(size) -> str:
+    """Formatea un tamaño en bytes con la unidad binaria adecuada (B, KiB, ...)."""
+    # La unidad sale de la posición del bit más alto: cada 10 bits es un factor 1024
+    idx = min(len(_SIZE_UNITS) - 1, max(0, (int(size).bit_length() - 1) // 10))
+    return f"{size / _SIZE_DIVISORS[idx]:.2f}{_SIZE_UNITS[idx]}"
+
+
+# El tamaño total casi no cambia entre llamadas del hook: se formatea una vez
+_format_total = lru_cache(maxsize=16)(format_size)
+
+# Intervalo mínimo (s) entre repintados del progreso de cada descarga (~10 Hz)
+PROGRESS_MIN_INTERVAL = 0.1
+# Estado por descarga (clave: d['filename']), protegido por _stdout_lock: con varias
+# descargas en paralelo cada una limita sus propios repintados y todas comparten la línea
+_progress_renders: Dict[str, float] = {}
+_progress_texts: Dict[str, Tuple[str, str]] = {}  # (texto completo, texto corto)
+_progress_width = 0
+
+
+def _render_progress():
+    """Repinta la línea de progreso con las descargas activas (llamar con _stdout_lock)."""
+    global _progress_width
+    texts = list(_progress_texts.values())
+    if len(texts) == 1:
+        line = f"📥 Descargando: {texts[0][0]}"
+    elif texts:
+        line = "📥 Descargando: " + " | ".join(short for _, short in texts)
+    else:
+        line = ""
+    # Rellenar con espacios para borrar lo que quede de una línea anterior más larga
+    sys.stdout.write('\r' + line.ljust(_progress_width))
+    if not line:
+        sys.stdout.write('\r')
+    sys.stdout.flush()
+    _progress_width = len(line)
 
 
 def progress_hook(d):
-    """Hook de progreso que actualiza una sola línea."""
+    """Hook de progreso que actualiza una sola línea (compartida por las descargas en curso)."""
+    key = d.get('filename') or ''
     if d['status'] == 'downloading':
         total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
         downloaded = d.get('downloaded_bytes', 0)
         if total > 0:
+            # Limitar los repintados; el último (descarga completa) siempre se muestra
+            now = time.monotonic()
+            if now - _progress_renders.get(key, 0.0) < PROGRESS_MIN_INTERVAL and downloaded < total:
+                return
             percent = (downloaded / total) * 100
             speed = d.get('speed', 0)
             eta = d.get('eta', 0)
-            def format_size(size):
-                for unit in ['B', 'KiB', 'MiB', 'GiB']:
-                    if size < 1024.0:
-                        return f"{size:.2f}{unit}"
-                    size /= 1024.0
-                return f"{size:.2f}TiB"
             speed_str = format_size(speed) + '/s' if speed > 0 else '?'
             eta_str = f"{eta // 60:02d}:{eta % 60:02d}" if eta else "??:??"
-            progress_line = f"\r📥 Descargando: {percent:.1f}% de {format_size(total)} a {speed_str} (ETA: {eta_str})"
-            sys.stdout.write(progress_line)
-            sys.stdout.flush()
-    elif d['status'] == 'finished':
-        sys.stdout.write('\r' + ' ' * 80 + '\r')
-        sys.stdout.flush()
+            full = f"{percent:.1f}% de {_format_total(total)} a {speed_str} (ETA: {eta_str})"
+            with _stdout_lock:
+                _progress_renders[key] = now
+                _progress_texts[key] = (full, f"{percent:.0f}%")
+                _render_progress()
+    elif d['status'] in ('finished', 'error'):
+        # Quitar esta descarga de la línea (se borra si era la única)
+        with _stdout_lock:
+            _progress_renders.pop(key, None)
+            _progress_texts.pop(key, None)
+            _render_progress()
+
+
+def classify_download_error(error: Exception) -> str:
+    """
+    Clasifica un error de yt-dlp por su tipo y su mensaje (sin serializar la excepción).
+    Devuelve ERROR_UNAVAILABLE o ERROR_OTHER.
+    """
+    if not isinstance(error, YoutubeDLError):
+        return ERROR_OTHER
+    msg = error.msg or ''
+    if _UNAVAILABLE_ERROR_RE.search(msg):
+        return ERROR_UNAVAILABLE
+    return ERROR_OTHER
 
 
-def download_quick(url: str):
-    """Descarga rápida sin metadatos avanzados. Usa get_video_info y cascada de formatos como la app."""
-    music_path = Path(MUSIC_FOLDER)
-    music_path.mkdir(parents=True, exist_ok=True)
+def _log(msg: str):
+    """Imprime una línea de log sin mezclarla con el progreso de otras descargas."""
+    with _stdout_lock:
+        print(msg)
+
+
+def download_quick(url: str) -> bool:
+    """Descarga rápida sin metadatos avanzados. Usa get_video_info y cascada de formatos como la app.
+    Devuelve True si la descarga terminó bien."""
+    try:
+        _ensure_music_path()
+    except OSError as e:
+        print(f"❌ Error: No se pudo crear la carpeta de música {MUSIC_PATH}: {e}")
+        return False
 
     # Obtener título con la misma lógica robusta que la app (extract_flat primero, cookies, etc.)
     try:
-        from download_youtube import get_video_info
-        info = get_video_info(url)
+        info = get_video_info(url, log_callback=_log)
         title = info.get('title', 'video') if info else 'video'
         sanitized_title = sanitize_filename(title)
     except Exception as e:
@@ -67,16 +194,9 @@ def download_quick(url: str):
         sanitized_title = 'video'
 
     # Cascada de formatos (igual que download_audio) para vídeos con formatos limitados
-    from download_youtube import get_cookies_file
     cookies_file = get_cookies_file()
-    format_attempts = [
-        'bestaudio/best/worst',
-        'bestaudio/best',
-        'best/worst',
-        'best[height<=720]/best',
-        'worst[ext=mp4]/worst',
-    ]
-    outtmpl = str(music_path / f'{sanitized_title}.%(ext)s')
+    format_attempts = FORMAT_ATTEMPTS
+    outtmpl = os.fspath(MUSIC_PATH / f'{sanitized_title}.%(ext)s')
     base_opts = {
         'outtmpl': outtmpl,
         'postprocessors': [{
@@ -85,43 +205,125 @@ def download_quick(url: str):
             'preferredquality': '320',
         }],
         'progress_hooks': [progress_hook],
+        'concurrent_fragment_downloads': FRAGMENT_WORKERS,
+        **ARIA2C_OPTS,
         'quiet': False,
         'no_warnings': False,
     }
     cookie_attempts = [cookies_file] if cookies_file else [None]
     if cookies_file:
         cookie_attempts.append(None)
+    # Opciones por variante de cookies, construidas una sola vez antes de la cascada.
+    # El formato se cambia sobre la instancia (params y format_selector, que YoutubeDL
+    # construye una sola vez en __init__), así que los reintentos no crean diccionarios.
+    opts_by_cookie = {cf: ({**base_opts, 'cookiefile': cf} if cf else base_opts) for cf in cookie_attempts}
+    # Lista plana de intentos (formato, cookies): cada formato se prueba con todas las
+    # variantes de cookies antes de pasar al siguiente formato
+    attempts = list(dict.fromkeys(itertools.product(format_attempts, cookie_attempts)))
 
     last_error = None
-    for cookie_file in cookie_attempts:
-        for i, fmt in enumerate(format_attempts):
-            ydl_opts = {**base_opts, 'format': fmt}
-            if cookie_file:
-                ydl_opts['cookiefile'] = cookie_file
-            if i > 0:
-                print(f"⚠️  Intentando formato alternativo ({i + 1}/{len(format_attempts)}): {fmt}")
+    # Una sola instancia por variante de cookies, reutilizada en toda la cascada de
+    # formatos (conserva extractores y conexiones). Las cookies se cargan al crearla,
+    # por eso no se cambia cookiefile sobre la misma instancia.
+    ydls = {}
+    try:
+        for attempt, (fmt, cookie_file) in enumerate(attempts, 1):
+            ydl = ydls.get(cookie_file)
+            if ydl is None:
+                ydl = ydls[cookie_file] = create_ydl(opts_by_cookie[cookie_file])
+            ydl.params['format'] = fmt
+            ydl.format_selector = ydl.build_format_selector(fmt)
+            if attempt > 1:
+                cookies_note = ' con cookies' if cookie_file else ' sin cookies'
+                print(f"⚠️  Intentando alternativa ({attempt}/{len(attempts)}): {fmt}{cookies_note}")
             try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    print(f"Descargando: {url}")
-                    ydl.download([url])
+                print(f"Descargando: {url}")
+                ydl.download([url])
                 print("✅ Descarga completada!")
-                return
+                return True
             except Exception as e:
                 last_error = e
-                if 'Requested format is not available' in str(e) or 'Only images are available' in str(e):
-                    continue
-                if 'Video unavailable' in str(e) or 'Private video' in str(e):
+                # Video no disponible/privado: ningún otro intento lo va a arreglar
+                if classify_download_error(e) == ERROR_UNAVAILABLE:
                     break
-                continue
+    finally:
+        for ydl in ydls.values():
+            close_ydl(ydl)
 
     print(f"❌ Error: {last_error}")
-    sys.exit(1)
+    return False
+
+
+def download_many(urls: List[str], max_workers: Optional[int] = None) -> int:
+    """
+    Descarga varias URLs en paralelo (un thread por descarga, hasta max_workers).
+    Cada thread crea su propio YoutubeDL, ya que no es seguro compartirlo. get_video_info
+    captura los mensajes de yt-dlp con un logger por llamada (no redirige sys.stderr),
+    así que puede ejecutarse desde varios threads a la vez.
+    
+    Returns:
+        Número de descargas fallidas.
+    """
+    if not urls:
+        return 0
+    if max_workers is None:
+        max_workers = min(MAX_PARALLEL_DOWNLOADS, len(urls))
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(download_quick, url): url for url in urls}
+        for future in as_completed(futures):
+            if not future.result():
+                failed += 1
+    return failed
+
+
+def read_urls(stream) -> List[str]:
+    """Lee URLs de un fichero o stdin (una por línea), ignorando líneas vacías y comentarios (#)."""
+    urls = []
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line)
+    return urls
+
+
+USAGE = (
+    "Uso: python download_quick.py <URL_YOUTUBE> [<URL_YOUTUBE> ...] [--jobs N]\n"
+    "     python download_quick.py - [--jobs N]          (URLs desde stdin, una por línea)\n"
+    "     python download_quick.py -a FICHERO [--jobs N] (URLs desde un fichero)"
+)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Uso: python download_quick.py <URL_YOUTUBE>")
+    # Modo lote: todas las URLs se procesan en este mismo intérprete (sin pagar
+    # el arranque de Python ni el import de yt-dlp por cada URL)
+    args = sys.argv[1:]
+    max_workers = None
+    if '--jobs' in args:
+        idx = args.index('--jobs')
+        if idx + 1 >= len(args) or not args[idx + 1].isdigit() or int(args[idx + 1]) < 1:
+            print(USAGE)
+            sys.exit(1)
+        max_workers = int(args[idx + 1])
+        del args[idx:idx + 2]
+    
+    urls = []
+    if '-a' in args:
+        idx = args.index('-a')
+        if idx + 1 >= len(args):
+            print(USAGE)
+            sys.exit(1)
+        with open(args[idx + 1], encoding='utf-8') as f:
+            urls.extend(read_urls(f))
+        del args[idx:idx + 2]
+    if '-' in args:
+        args.remove('-')
+        urls.extend(read_urls(sys.stdin))
+    urls.extend(args)
+    
+    if not urls:
+        print(USAGE)
         sys.exit(1)
     
-    download_quick(sys.argv[1])
-
+    failed = download_many(urls, max_workers)
+    sys.exit(1 if failed else 0)
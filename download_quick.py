@@ -7,95 +7,176 @@ Versión simplificada del script principal.
 import os
 import sys
 import re
+import shutil
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from pathlib import Path
+from typing import Dict, List, Optional, Tuple
 import yt_dlp
+from yt_dlp.postprocessor.metadataparser import MetadataParserPP
 from dotenv import load_dotenv
 
 load_dotenv()
 
 MUSIC_FOLDER = os.getenv('MUSIC_FOLDER', os.path.expanduser('~/Music'))
+# Carpeta de destino resuelta y creada una sola vez (no en cada descarga)
+MUSIC_PATH = Path(MUSIC_FOLDER)
+_music_path_ready = False
+
+
+def _ensure_music_path():
+    """Crea MUSIC_PATH la primera vez; lanza OSError si no se puede."""
+    global _music_path_ready
+    if not _music_path_ready:
+        MUSIC_PATH.mkdir(parents=True, exist_ok=True)
+        _music_path_ready = True
+
+
+# app.py e ide.py importan este módulo al arrancar: una carpeta inaccesible
+# (disco sin montar, sin permisos) no debe impedirlo; se reintenta al descargar
+try:
+    _ensure_music_path()
+except OSError:
+    pass
+
+# Descargas simultáneas por defecto en modo lote
+MAX_PARALLEL_DOWNLOADS = 4
+# Fragmentos descargados en paralelo dentro de un mismo video (formatos HLS/DASH)
+FRAGMENT_WORKERS = int(os.getenv('YDL_FRAG_WORKERS', '4'))
+
+# Si aria2c está instalado, se usa para descargas HTTP de un solo fichero con varias
+# conexiones (peticiones Range) en paralelo. Los formatos fragmentados (HLS/DASH)
+# siguen con el descargador nativo y concurrent_fragment_downloads.
+# Con aria2c el progreso lo muestra aria2c; progress_hook solo recibe 'finished'.
+HAS_ARIA2C = shutil.which('aria2c') is not None
+ARIA2C_OPTS = {
+    'external_downloader': {'http': 'aria2c'},
+    'external_downloader_args': {'aria2c': ['-x', '16', '-k', '1M', '--console-log-level=warn']},
+} if HAS_ARIA2C else {}
+
+# Evita que las líneas de progreso de descargas simultáneas se mezclen
+_stdout_lock = threading.Lock()
+
+# Patrones de sanitize_filename compilados una sola vez
+_INVALID_FILENAME_CHARS = re.compile(r'[<>:"/\\|?*]')
+_WHITESPACE_RUN = re.compile(r'\s+')
+
+# Unidades binarias de format_size y su divisor (1024^i)
+_SIZE_UNITS = ('B', 'KiB', 'MiB', 'GiB', 'TiB')
+_SIZE_DIVISORS = tuple(1 << (10 * i) for i in range(len(_SIZE_UNITS)))
 
 
 def sanitize_filename(filename: str) -> str:
     """Limpia el nombre de archivo para que sea válido en el sistema de archivos."""
-    # Remover caracteres no permitidos
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
-    # Reemplazar espacios múltiples por uno solo
-    filename = re.sub(r'\s+', ' ', filename)
+    # Remover caracteres no permitidos y reemplazar espacios múltiples por uno solo
+    filename = _WHITESPACE_RUN.sub(' ', _INVALID_FILENAME_CHARS.sub('', filename))
     # Limitar longitud a 100 caracteres para evitar nombres demasiado largos
-    if len(filename) > 100:
-        filename = filename[:100]
-    return filename.strip()
+    return filename[:100].strip()
+
+
+# Lo mismo que sanitize_filename, aplicado por yt-dlp sobre el campo filename_title
+# antes de descargar (el título llega con la propia descarga, sin extract_info previo)
+_FILENAME_TITLE_PP = {
+    'key': 'MetadataParser',
+    'when': 'pre_process',
+    'actions': [
+        (MetadataParserPP.Actions.INTERPRET, 'title', 'filename_title'),
+        (MetadataParserPP.Actions.REPLACE, 'filename_title', _INVALID_FILENAME_CHARS.pattern, ''),
+        (MetadataParserPP.Actions.REPLACE, 'filename_title', _WHITESPACE_RUN.pattern, ' '),
+        (MetadataParserPP.Actions.REPLACE, 'filename_title', r'(?s)^(.{100}).+$', r'\1'),
+        (MetadataParserPP.Actions.REPLACE, 'filename_title', r'^\s+|\s+$', ''),
+    ],
+}
+
+
+def format_size(size) -> str:
+    """Formatea un tamaño en bytes con la unidad binaria adecuada (B, KiB, ...)."""
+    # La unidad sale de la posición del bit más alto: cada 10 bits es un factor 1024
+    idx = min(len(_SIZE_UNITS) - 1, max(0, (int(size).bit_length() - 1) // 10))
+    return f"{size / _SIZE_DIVISORS[idx]:.2f}{_SIZE_UNITS[idx]}"
+
+
+# El tamaño total casi no cambia entre llamadas del hook: se formatea una vez
+_format_total = lru_cache(maxsize=16)(format_size)
+
+# Intervalo mínimo (s) entre repintados del progreso de cada descarga (~10 Hz)
+PROGRESS_MIN_INTERVAL = 0.1
+# Estado por descarga (clave: d['filename']), protegido por _stdout_lock: con varias
+# descargas en paralelo cada una limita sus propios repintados y todas comparten la línea
+_progress_renders: Dict[str, float] = {}
+_progress_texts: Dict[str, Tuple[str, str]] = {}  # (texto completo, texto corto)
+_progress_width = 0
+
+
+def _render_progress():
+    """Repinta la línea de progreso con las descargas activas (llamar con _stdout_lock)."""
+    global _progress_width
+    texts = list(_progress_texts.values())
+    if len(texts) == 1:
+        line = f"📥 Descargando: {texts[0][0]}"
+    elif texts:
+        line = "📥 Descargando: " + " | ".join(short for _, short in texts)
+    else:
+        line = ""
+    # Rellenar con espacios para borrar lo que quede de una línea anterior más larga
+    sys.stdout.write('\r' + line.ljust(_progress_width))
+    if not line:
+        sys.stdout.write('\r')
+    sys.stdout.flush()
+    _progress_width = len(line)
 
 
 def progress_hook(d):
-    """Hook de progreso que actualiza una sola línea."""
+    """Hook de progreso que actualiza una sola línea (compartida por las descargas en curso)."""
+    key = d.get('filename') or ''
     if d['status'] == 'downloading':
         total = d.get('total_bytes') or d.get('total_bytes_estimate', 0)
         downloaded = d.get('downloaded_bytes', 0)
-        
         if total > 0:
+            # Limitar los repintados; el último (descarga completa) siempre se muestra
+            now = time.monotonic()
+            if now - _progress_renders.get(key, 0.0) < PROGRESS_MIN_INTERVAL and downloaded < total:
+                return
             percent = (downloaded / total) * 100
             speed = d.get('speed', 0)
             eta = d.get('eta', 0)
-            
-            # Formatear tamaño
-            def format_size(size):
-                for unit in ['B', 'KiB', 'MiB', 'GiB']:
-                    if size < 1024.0:
-                        return f"{size:.2f}{unit}"
-                    size /= 1024.0
-                return f"{size:.2f}TiB"
-            
-            # Formatear velocidad
             speed_str = format_size(speed) + '/s' if speed > 0 else '?'
-            
-            # Formatear ETA
-            if eta:
-                eta_min = eta // 60
-                eta_sec = eta % 60
-                eta_str = f"{eta_min:02d}:{eta_sec:02d}"
-            else:
-                eta_str = "??:??"
-            
-            # Actualizar línea (usar \r para sobrescribir)
-            progress_line = f"\r📥 Descargando: {percent:.1f}% de {format_size(total)} a {speed_str} (ETA: {eta_str})"
-            sys.stdout.write(progress_line)
-            sys.stdout.flush()
-    elif d['status'] == 'finished':
-        # Limpiar la línea de progreso y mostrar mensaje final
-        sys.stdout.write('\r' + ' ' * 80 + '\r')  # Limpiar línea
-        sys.stdout.flush()
-
-
-def download_quick(url: str):
-    """Descarga rápida sin metadatos avanzados."""
-    music_path = Path(MUSIC_FOLDER)
-    music_path.mkdir(parents=True, exist_ok=True)
-    
-    # Obtener información del video primero para sanitizar el título
+            eta_str = f"{eta // 60:02d}:{eta % 60:02d}" if eta else "??:??"
+            full = f"{percent:.1f}% de {_format_total(total)} a {speed_str} (ETA: {eta_str})"
+            with _stdout_lock:
+                _progress_renders[key] = now
+                _progress_texts[key] = (full, f"{percent:.0f}%")
+                _render_progress()
+    elif d['status'] in ('finished', 'error'):
+        # Quitar esta descarga de la línea (se borra si era la única)
+        with _stdout_lock:
+            _progress_renders.pop(key, None)
+            _progress_texts.pop(key, None)
+            _render_progress()
+
+
+def download_quick(url: str) -> bool:
+    """Descarga rápida sin metadatos avanzados. Devuelve True si la descarga terminó bien."""
     try:
-        info_opts = {
-            'quiet': True,
-            'no_warnings': True,
-        }
-        with yt_dlp.YoutubeDL(info_opts) as ydl:
-            info = ydl.extract_info(url, download=False)
-            title = info.get('title', 'video')
-            sanitized_title = sanitize_filename(title)
-    except Exception as e:
-        print(f"⚠️  Advertencia: No se pudo obtener el título del video: {e}")
-        sanitized_title = 'video'
-    
+        _ensure_music_path()
+    except OSError as e:
+        print(f"❌ Error: No se pudo crear la carpeta de música {MUSIC_PATH}: {e}")
+        return False
     ydl_opts = {
         'format': 'bestaudio/best',
-        'outtmpl': str(music_path / f'{sanitized_title}.%(ext)s'),
-        'postprocessors': [{
+        # yt-dlp rellena el título durante la propia descarga (sin extract_info previo);
+        # _FILENAME_TITLE_PP lo limpia como sanitize_filename antes de formar el nombre
+        'outtmpl': os.fspath(MUSIC_PATH / '%(filename_title)s.%(ext)s'),
+        'postprocessors': [_FILENAME_TITLE_PP, {
             'key': 'FFmpegExtractAudio',
             'preferredcodec': 'mp3',
             'preferredquality': '320',
         }],
         'progress_hooks': [progress_hook],
+        'concurrent_fragment_downloads': FRAGMENT_WORKERS,
+        **ARIA2C_OPTS,
         'quiet': False,
         'no_warnings': False,
     }
@@ -105,15 +186,80 @@ def download_quick(url: str):
             print(f"Descargando: {url}")
             ydl.download([url])
             print("✅ Descarga completada!")
+        return True
     except Exception as e:
         print(f"❌ Error: {e}")
-        sys.exit(1)
+        return False
+
+
+def download_many(urls: List[str], max_workers: Optional[int] = None) -> int:
+    """
+    Descarga varias URLs en paralelo (un thread por descarga, hasta max_workers).
+    Cada thread crea su propio YoutubeDL, ya que no es seguro compartirlo.
+    
+    Returns:
+        Número de descargas fallidas.
+    """
+    if not urls:
+        return 0
+    if max_workers is None:
+        max_workers = min(MAX_PARALLEL_DOWNLOADS, len(urls))
+    failed = 0
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {executor.submit(download_quick, url): url for url in urls}
+        for future in as_completed(futures):
+            if not future.result():
+                failed += 1
+    return failed
+
+
+def read_urls(stream) -> List[str]:
+    """Lee URLs de un fichero o stdin (una por línea), ignorando líneas vacías y comentarios (#)."""
+    urls = []
+    for line in stream:
+        line = line.strip()
+        if line and not line.startswith('#'):
+            urls.append(line)
+    return urls
+
+
+USAGE = (
+    "Uso: python download_quick.py <URL_YOUTUBE> [<URL_YOUTUBE> ...] [--jobs N]\n"
+    "     python download_quick.py - [--jobs N]          (URLs desde stdin, una por línea)\n"
+    "     python download_quick.py -a FICHERO [--jobs N] (URLs desde un fichero)"
+)
 
 
 if __name__ == '__main__':
-    if len(sys.argv) < 2:
-        print("Uso: python download_quick.py <URL_YOUTUBE>")
+    # Modo lote: todas las URLs se procesan en este mismo intérprete (sin pagar
+    # el arranque de Python ni el import de yt-dlp por cada URL)
+    args = sys.argv[1:]
+    max_workers = None
+    if '--jobs' in args:
+        idx = args.index('--jobs')
+        if idx + 1 >= len(args) or not args[idx + 1].isdigit() or int(args[idx + 1]) < 1:
+            print(USAGE)
+            sys.exit(1)
+        max_workers = int(args[idx + 1])
+        del args[idx:idx + 2]
+    
+    urls = []
+    if '-a' in args:
+        idx = args.index('-a')
+        if idx + 1 >= len(args):
+            print(USAGE)
+            sys.exit(1)
+        with open(args[idx + 1], encoding='utf-8') as f:
+            urls.extend(read_urls(f))
+        del args[idx:idx + 2]
+    if '-' in args:
+        args.remove('-')
+        urls.extend(read_urls(sys.stdin))
+    urls.extend(args)
+    
+    if not urls:
+        print(USAGE)
         sys.exit(1)
     
-    download_quick(sys.argv[1])
-
+    failed = download_many(urls, max_workers)
+    sys.exit(1 if failed else 0)
@@ -6,20 +6,31 @@ Incluye extracción de artista, año y estilo de música.
 
 import os
 import sys
+import errno
+import io
 import re
 import json
+import math
 import urllib.parse
 import urllib.request
 import subprocess
 import shutil
+import contextlib
+import functools
+import hashlib
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
 from pathlib import Path
-from typing import Optional, Dict, Tuple
+from typing import Optional, Dict, List, Tuple
 from datetime import datetime
 import yt_dlp
+from mutagen import MutagenError
 from mutagen.mp3 import MP3
 from mutagen.id3 import ID3, TIT2, TPE1, TALB, TDRC, TCON, APIC
 from dotenv import load_dotenv
-from database import MusicDatabase
+from database import MusicDatabase, VIDEO_INFO_TTL_DAYS
 
 # Configurar TensorFlow para reducir verbosidad de logs
 # Solo mostrar errores críticos, una línea por ejecución
@@ -28,6 +39,8 @@ os.environ['TF_CPP_MIN_VLOG_LEVEL'] = '3'  # Desactivar logs verbosos
 
 try:
     import requests
+    from requests.adapters import HTTPAdapter
+    from urllib3.util.retry import Retry
     REQUESTS_AVAILABLE = True
 except ImportError:
     REQUESTS_AVAILABLE = False
@@ -35,6 +48,7 @@ except ImportError:
 
 try:
     import essentia.standard as es
+    import numpy as np
     ESSENTIA_AVAILABLE = True
 except ImportError:
     ESSENTIA_AVAILABLE = False
@@ -47,6 +61,12 @@ try:
 except ImportError:
     TF_CLASSIFIER_AVAILABLE = False
 
+# fcntl solo existe en sistemas Unix; se usa para copiar con reflink en Linux
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
 
 
 def test_essentia_installation():
@@ -96,21 +116,411 @@ load_dotenv()
 MUSIC_FOLDER = os.getenv('MUSIC_FOLDER', os.path.expanduser('~/Music'))
 QUALITY = 'bestaudio/best'  # Mejor calidad disponible
 DB_PATH = os.getenv('DB_PATH', None)  # None = usar ruta por defecto
+GENRE_LOOKUP_MEMO_SIZE = 4096  # Respuestas de cada fuente de género guardadas en memoria
+VIDEO_INFO_MEMO_SIZE = 2048  # Información de videos de YouTube guardada en memoria
+ESSENTIA_GENRE_MEMO_SIZE = 256  # Géneros detectados con Essentia guardados en memoria
+THUMBNAIL_CACHE_SIZE = 32  # Portadas descargadas guardadas en memoria
+ONLINE_GENRE_TIMEOUT = 15  # Segundos máximos esperando a las fuentes online de género
+# Descargas simultáneas al monitorear 'me gusta' (más de 4 provoca errores 429 de YouTube)
+MAX_PARALLEL_DOWNLOADS = 4
+# Consultas simultáneas de información de videos al revisar la lista de 'me gusta'
+VIDEO_INFO_WORKERS = 8
+# MusicBrainz pide un User-Agent que identifique la aplicación
+_MUSICBRAINZ_HEADERS = {
+    'User-Agent': 'YouTubeMusicDownloader/1.0 (https://example.com)',
+    'Accept': 'application/json'
+}
+# Audio cargado para el análisis con Essentia (MusicNN): frecuencia y duración del fragmento
+ESSENTIA_SAMPLE_RATE = 22050
+ESSENTIA_EXCERPT_SECONDS = 60
+# Fragmento central analizado para descartar rápido las pistas con volumen suficiente
+LOUDNESS_SCREEN_SECONDS = 60
+HTML_READ_LIMIT = 64 * 1024  # Bytes máximos leídos de una página HTML al buscar géneros
+DUCKDUCKGO_API_URL = 'https://api.duckduckgo.com/'
+# Cabeceras de navegador por defecto de la sesión HTTP compartida
+_BROWSER_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    # Páginas en inglés: las palabras clave de género están en inglés
+    'Accept-Language': 'en',
+}
+
+
+def _create_http_session():
+    """
+    Crea una sesión HTTP compartida (keep-alive y pool de conexiones) para las
+    consultas de género y las portadas, de forma que las peticiones repetidas al
+    mismo host reutilicen la conexión TLS en lugar de abrir una nueva cada vez.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        max_retries=Retry(total=2, backoff_factor=0.3),
+        pool_connections=8,
+        pool_maxsize=16,
+    )
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    session.headers.update(_BROWSER_HEADERS)
+    return session
+
+
+_HTTP_SESSION = _create_http_session() if REQUESTS_AVAILABLE else None
+
+
+@functools.lru_cache(maxsize=THUMBNAIL_CACHE_SIZE)
+def fetch_thumbnail(url: str, timeout: float = 10) -> bytes:
+    """
+    Descarga una portada (con la sesión HTTP compartida si está disponible).
+    
+    Las últimas portadas se guardan en memoria: la vista previa antes de preguntar
+    y las etiquetas ID3 después de descargar piden la misma imagen.
+    """
+    if _HTTP_SESSION is not None:
+        response = _HTTP_SESSION.get(url, timeout=timeout)
+        response.raise_for_status()
+        return response.content
+    with urllib.request.urlopen(url, timeout=timeout) as response:
+        return response.read()
+
 
 # Inicializar base de datos
 db = MusicDatabase(DB_PATH)
 
+# Un solo hilo para Essentia: el análisis ya usa la CPU de forma intensiva
+_AUDIO_ANALYSIS_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix='essentia')
+
+# Hilos compartidos para las fuentes online de género (4 fuentes x 2 detecciones a la vez)
+_GENRE_LOOKUP_EXECUTOR = ThreadPoolExecutor(max_workers=8, thread_name_prefix='genre-lookup')
+
+
+class _LookupSkipped(Exception):
+    """Una fuente de género decidió no consultar ahora (p. ej. por límite de peticiones)."""
+
+
+class _RateLimiter:
+    """
+    Limita una fuente a una petición cada `min_interval` segundos sin bloquear:
+    try_acquire() devuelve False si todavía no toca.
+    """
+    
+    def __init__(self, min_interval: float):
+        self._min_interval = min_interval
+        self._last = float('-inf')
+        self._lock = threading.Lock()
+    
+    def try_acquire(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            if now - self._last < self._min_interval:
+                return False
+            self._last = now
+            return True
+
+
+# MusicBrainz admite como máximo 1 petición por segundo y por IP
+_MUSICBRAINZ_LIMITER = _RateLimiter(1.0)
+
+
+def _cached_genre_lookup(source: str):
+    """
+    Decorador para las fuentes externas de género (artist, track): guarda la respuesta
+    en la base de datos para no repetir la consulta de red en siguientes ejecuciones,
+    y en memoria para no repetir ni la consulta a SQLite dentro de la misma ejecución.
+    Si la fuente lanza _LookupSkipped se devuelve None sin guardar nada.
+    """
+    def decorator(func):
+        memo: Dict[Tuple[str, str], Optional[str]] = {}
+        
+        @functools.wraps(func)
+        def wrapper(artist, track, *args, **kwargs):
+            if not artist or not track:
+                return func(artist, track, *args, **kwargs)
+            
+            key = (artist.strip().casefold(), track.strip().casefold())
+            if key in memo:
+                return memo[key]
+            
+            found, genre = db.get_cached_genre_lookup(source, artist, track)
+            if not found:
+                try:
+                    genre = func(artist, track, *args, **kwargs)
+                except _LookupSkipped:
+                    # No se consultó: no guardar nada en caché
+                    return None
+                # Si la búsqueda se canceló a medias no se sabe si hay género: no guardar
+                stop_event = kwargs.get('stop_event') or next(
+                    (arg for arg in args if isinstance(arg, threading.Event)), None)
+                if stop_event is not None and stop_event.is_set():
+                    return genre
+                db.set_cached_genre_lookup(source, artist, track, genre)
+            
+            if len(memo) >= GENRE_LOOKUP_MEMO_SIZE:
+                memo.clear()
+            memo[key] = genre
+            return genre
+        
+        wrapper.cache_clear = memo.clear
+        return wrapper
+    return decorator
 
+
+class _KeywordMatcher:
+    """
+    Busca muchas palabras clave en un texto respetando su orden de prioridad.
+    
+    search() devuelve el valor de la primera palabra clave (en orden de prioridad) que
+    aparece en el texto como palabra completa. Primero se comprueba con `in`, que es
+    una búsqueda de subcadena en C, y solo las candidatas que aparecen pasan por la
+    expresión regular con límites de palabra, compilada una sola vez.
+    """
+    
+    def __init__(self, keywords):
+        """
+        Args:
+            keywords: Pares (palabra_clave, valor) en orden de prioridad. Se exige límite
+                      de palabra (\\b) a ambos lados, salvo si la palabra clave empieza
+                      por '#' (hashtag), que solo lo exige al final.
+        """
+        self._entries = []
+        seen = set()
+        for keyword, value in keywords:
+            if keyword in seen:
+                continue
+            seen.add(keyword)
+            prefix = '' if keyword.startswith('#') else r'\b'
+            pattern = re.compile(prefix + re.escape(keyword) + r'\b')
+            self._entries.append((keyword, pattern, value))
+    
+    def search(self, text: str) -> Optional[str]:
+        """Devuelve el valor de la palabra clave de mayor prioridad encontrada, o None."""
+        for keyword, pattern, value in self._entries:
+            if keyword in text and pattern.search(text):
+                return value
+        return None
+
+
+# Géneros conocidos (se ordenan de más largo a más corto en _GENRES_BY_LEN_DESC)
+_GENRES = (
+    'tribal afro house', 'tribal house', 'afro house', 'progressive house', 'deep house', 'tech house',
+    'electro house', 'big room', 'future bass', 'bass house', 'melodic house',
+    'progressive trance', 'hard trance', 'uplifting trance', 'vocal trance',
+    'drum and bass', 'drum & bass', 'hip hop', 'house', 'techno', 'trance', 'dubstep', 'edm', 'minimal',
+    'hardstyle', 'hardcore', 'electro', 'trap', 'psytrance',
+    'rap', 'r&b', 'pop', 'rock', 'metal', 'jazz', 'blues',
+    'reggae', 'salsa', 'bachata', 'reggaeton', 'latin', 'funk', 'disco',
+    'ambient', 'downtempo', 'chillout', 'lo-fi', 'synthwave', 'vaporwave',
+    'future house', 'bassline', 'uk garage', 'jungle', 'dub techno', 'acid house',
+    'french house', 'ghetto house', 'baltimore club', 'ghetto tech', 'footwork',
+    'juke', 'gqom', 'amapiano', 'afrobeat', 'afro tech'
+)
+
+# Mapeo de palabras clave del título a géneros (ordenado por especificidad)
+_TITLE_KEYWORD_MAP = {
+    # Subgéneros específicos primero (más largos)
+    'tribal afro house': 'Afro House',
+    'tribal house': 'Tribal House',
+    'afro house': 'Afro House',
+    'progressive house': 'Progressive House',
+    'deep house': 'Deep House',
+    'tech house': 'Tech House',
+    'electro house': 'Electro House',
+    'future bass': 'Future Bass',
+    'bass house': 'Bass House',
+    'melodic house': 'Melodic House',
+    'big room': 'Big Room',
+    'drum and bass': 'Drum & Bass',
+    'drum & bass': 'Drum & Bass',
+    'progressive trance': 'Progressive Trance',
+    'hard trance': 'Hard Trance',
+    'uplifting trance': 'Uplifting Trance',
+    'vocal trance': 'Vocal Trance',
+    'hip hop': 'Hip Hop',
+    'trap music': 'Trap',
+    'psytrance': 'Psytrance',
+    'hardstyle': 'Hardstyle',
+    'hardcore': 'Hardcore',
+    'minimal techno': 'Minimal Techno',
+    'lo-fi': 'Lo-Fi',
+    'synthwave': 'Synthwave',
+    'vaporwave': 'Vaporwave',
+    'future house': 'Future House',
+    'bassline': 'Bassline',
+    'garage': 'UK Garage',
+    'jungle': 'Jungle',
+    'dub techno': 'Dub Techno',
+    'acid house': 'Acid House',
+    'french house': 'French House',
+    'ghetto house': 'Ghetto House',
+    'baltimore club': 'Baltimore Club',
+    'ghetto tech': 'Ghetto Tech',
+    'footwork': 'Footwork',
+    'juke': 'Juke',
+    'gqom': 'Gqom',
+    'amapiano': 'Amapiano',
+    'afrobeat': 'Afrobeat',
+    'afro tech': 'Afro Tech',
+    'afro': 'Afro House',  # Genérico para afro
+    'tribal': 'Tribal House',  # Genérico para tribal
+    
+    # Géneros principales
+    'house': 'House',
+    'techno': 'Techno',
+    'trance': 'Trance',
+    'dubstep': 'Dubstep',
+    'dnb': 'Drum & Bass',
+    'edm': 'EDM',
+    'rap': 'Rap',
+    'reggaeton': 'Reggaeton',
+    'latin': 'Latin',
+    'salsa': 'Salsa',
+    'bachata': 'Bachata',
+    'progressive': 'Progressive House',
+    'deep': 'Deep House',
+    'tech': 'Tech House',
+    'electro': 'Electro',
+    'trap': 'Trap',
+    'melodic': 'Melodic House',
+    'minimal': 'Minimal',
+    'ambient': 'Ambient',
+    'downtempo': 'Downtempo',
+    'chillout': 'Chillout',
+    'funk': 'Funk',
+    'disco': 'Disco',
+    'r&b': 'R&B',
+    'pop': 'Pop',
+    'rock': 'Rock',
+    'metal': 'Metal',
+    'jazz': 'Jazz',
+    'blues': 'Blues',
+    'reggae': 'Reggae',
+}
+
+# Géneros comunes en hashtags (ordenados por especificidad)
+_GENRE_HASHTAGS = {
+    'tribalafrohouse': 'Afro House',
+    'tribalhouse': 'Tribal House',
+    'afrohouse': 'Afro House',
+    'progressivehouse': 'Progressive House',
+    'deephouse': 'Deep House',
+    'techhouse': 'Tech House',
+    'electrohouse': 'Electro House',
+    'futurebass': 'Future Bass',
+    'basshouse': 'Bass House',
+    'melodichouse': 'Melodic House',
+    'bigroom': 'Big Room',
+    'drumandbass': 'Drum & Bass',
+    'drum&bass': 'Drum & Bass',
+    'dnb': 'Drum & Bass',
+    'progressive': 'Progressive House',
+    'hiphop': 'Hip Hop',
+    'trapmusic': 'Trap',
+    'psytrance': 'Psytrance',
+    'hardstyle': 'Hardstyle',
+    'hardcore': 'Hardcore',
+    'minimaltechno': 'Minimal Techno',
+    'lofi': 'Lo-Fi',
+    'synthwave': 'Synthwave',
+    'vaporwave': 'Vaporwave',
+    'futurehouse': 'Future House',
+    'ukgarage': 'UK Garage',
+    'jungle': 'Jungle',
+    'dubtechno': 'Dub Techno',
+    'acidhouse': 'Acid House',
+    'frenchhouse': 'French House',
+    'ghettohouse': 'Ghetto House',
+    'baltimoreclub': 'Baltimore Club',
+    'ghettotech': 'Ghetto Tech',
+    'footwork': 'Footwork',
+    'juke': 'Juke',
+    'gqom': 'Gqom',
+    'amapiano': 'Amapiano',
+    'afrobeat': 'Afrobeat',
+    'afrotech': 'Afro Tech',
+    'house': 'House',
+    'techno': 'Techno',
+    'trance': 'Trance',
+    'dubstep': 'Dubstep',
+    'edm': 'EDM',
+    'rap': 'Rap',
+    'reggaeton': 'Reggaeton',
+    'latin': 'Latin',
+    'salsa': 'Salsa',
+    'bachata': 'Bachata',
+    'trap': 'Trap',
+    'minimal': 'Minimal',
+    'ambient': 'Ambient',
+    'downtempo': 'Downtempo',
+    'chillout': 'Chillout',
+    'funk': 'Funk',
+    'disco': 'Disco',
+    'r&b': 'R&B',
+    'pop': 'Pop',
+    'rock': 'Rock',
+    'metal': 'Metal',
+    'jazz': 'Jazz',
+    'blues': 'Blues',
+    'reggae': 'Reggae',
+}
+
+
+# Mapeo de palabras clave en nombres de canales a géneros
+_CHANNEL_KEYWORDS = {
+    'house': 'House',
+    'techno': 'Techno',
+    'trance': 'Trance',
+    'dubstep': 'Dubstep',
+    'drum and bass': 'Drum & Bass',
+    'dnb': 'Drum & Bass',
+    'hardstyle': 'Hardstyle',
+    'hardcore': 'Hardcore',
+    'edm': 'EDM',
+    'hip hop': 'Hip Hop',
+    'rap': 'Rap',
+    'reggaeton': 'Reggaeton',
+    'latin': 'Latin',
+    'salsa': 'Salsa',
+    'bachata': 'Bachata',
+}
+_CHANNEL_KEYWORDS_BY_LEN_DESC = tuple(sorted(_CHANNEL_KEYWORDS.items(), key=lambda x: len(x[0]), reverse=True))
+
+
+def _hashtag_keywords():
+    """Pares (patrón, género) de hashtags: como hashtag (#tribalhouse) o como palabra (tribal house)."""
+    for hashtag, genre in sorted(_GENRE_HASHTAGS.items(), key=lambda x: len(x[0]), reverse=True):
+        yield '#' + hashtag, genre
+        yield hashtag.replace('house', ' house').replace('techno', ' techno').replace('trance', ' trance'), genre
+
+
+# Patrones de la descripción donde se suele mencionar el género.
+# Se aplican sobre texto ya en minúsculas: sin IGNORECASE, re puede buscar el
+# prefijo literal ('genre', 'style'...) directamente y es mucho más rápido
+_DESCRIPTION_GENRE_PATTERNS = tuple(re.compile(p) for p in (
+    r'genre[:\s]+([^\n,\.]+)',
+    r'style[:\s]+([^\n,\.]+)',
+    r'categor[yi][:\s]+([^\n,\.]+)',
+    r'type[:\s]+([^\n,\.]+)',
+    r'#([^\s#]+)',  # Hashtags
+))
+
+# Buscadores compilados una sola vez (palabras clave más largas primero)
+_GENRES_BY_LEN_DESC: Tuple[str, ...] = tuple(sorted(_GENRES, key=len, reverse=True))
+_GENRE_MATCHER = _KeywordMatcher((g, g.title()) for g in _GENRES_BY_LEN_DESC)
+_TITLE_KEYWORD_MATCHER = _KeywordMatcher(sorted(_TITLE_KEYWORD_MAP.items(), key=lambda x: len(x[0]), reverse=True))
+_HASHTAG_MATCHER = _KeywordMatcher(_hashtag_keywords())
+
+
+@_cached_genre_lookup('lastfm')
 def get_genre_from_lastfm(artist: str, track: str) -> Optional[str]:
     """
     Intenta obtener el género de la canción usando Last.fm API.
-    Nota: Last.fm requiere API key, pero podemos intentar sin ella primero.
+    Nota: track.getInfo requiere API key; sin LASTFM_API_KEY no se hace la petición.
     """
     if not REQUESTS_AVAILABLE:
         return None
     
-    # Intentar con API key del .env si está disponible
+    # La clave se lee en cada llamada: la interfaz web puede recargar el .env en caliente
     lastfm_api_key = os.getenv('LASTFM_API_KEY', '')
+    if not lastfm_api_key:
+        raise _LookupSkipped('lastfm')
     
     try:
         url = "http://ws.audioscrobbler.com/2.0/"
@@ -118,14 +528,11 @@ def get_genre_from_lastfm(artist: str, track: str) -> Optional[str]:
             'method': 'track.getInfo',
             'artist': artist,
             'track': track,
-            'format': 'json'
+            'format': 'json',
+            'api_key': lastfm_api_key
         }
         
-        # Solo añadir API key si está disponible
-        if lastfm_api_key:
-            params['api_key'] = lastfm_api_key
-        
-        response = requests.get(url, params=params, timeout=5)
+        response = _HTTP_SESSION.get(url, params=params, timeout=5)
         if response.status_code == 200:
             data = response.json()
             if 'track' in data and 'toptags' in data['track']:
@@ -142,25 +549,33 @@ def get_genre_from_lastfm(artist: str, track: str) -> Optional[str]:
     return None
 
 
-def get_genre_from_web_search(artist: str, track: str) -> Optional[str]:
+def _duckduckgo_answer_text(data: Dict) -> str:
+    """
+    Junta el texto útil de una respuesta de la API de DuckDuckGo:
+    el resumen (AbstractText) y los textos de los temas relacionados.
+    """
+    texts = [data.get('AbstractText') or '']
+    for topic in data.get('RelatedTopics') or []:
+        # Los temas pueden venir agrupados en {'Name': ..., 'Topics': [...]}
+        for item in topic.get('Topics', [topic]):
+            texts.append(item.get('Text') or '')
+    return ' '.join(texts)
+
+
+@_cached_genre_lookup('web_search')
+def get_genre_from_web_search(artist: str, track: str,
+                              stop_event: Optional[threading.Event] = None) -> Optional[str]:
     """
     Busca el género de la canción mediante búsqueda web.
     Usa múltiples estrategias para encontrar el género.
+    Si se pasa stop_event y se activa, deja de probar más búsquedas.
+    Se puede desactivar con WEB_GENRE_SEARCH=0 en el .env.
     """
     if not REQUESTS_AVAILABLE:
         return None
     
-    # Géneros comunes a buscar (ordenados por longitud descendente)
-    genres = [
-        'drum and bass', 'drum & bass', 'progressive house', 'deep house', 'tech house',
-        'electro house', 'big room', 'future bass', 'bass house', 'melodic house',
-        'progressive trance', 'hard trance', 'uplifting trance', 'vocal trance',
-        'hip hop', 'house', 'techno', 'trance', 'dubstep', 'edm', 'minimal',
-        'hardstyle', 'hardcore', 'electro', 'trap', 'psytrance',
-        'rap', 'r&b', 'pop', 'rock', 'metal', 'jazz', 'blues',
-        'reggae', 'salsa', 'bachata', 'reggaeton', 'latin', 'funk', 'disco',
-        'ambient', 'downtempo', 'chillout', 'lo-fi', 'synthwave', 'vaporwave'
-    ]
+    if os.getenv('WEB_GENRE_SEARCH', '1').strip().lower() in ('0', 'false', 'no'):
+        raise _LookupSkipped('web_search')
     
     search_queries = [
         f"{artist} {track} genre",
@@ -170,26 +585,23 @@ def get_genre_from_web_search(artist: str, track: str) -> Optional[str]:
     ]
     
     for query in search_queries:
+        if stop_event is not None and stop_event.is_set():
+            return None
         try:
-            # Intentar con DuckDuckGo (sin API key necesario)
-            search_url = f"https://html.duckduckgo.com/html/?q={urllib.parse.quote(query)}"
-            
-            headers = {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-            }
-            
-            response = requests.get(search_url, headers=headers, timeout=10)
+            # API de respuestas instantáneas de DuckDuckGo (JSON pequeño, sin API key)
+            response = _HTTP_SESSION.get(DUCKDUCKGO_API_URL, params={
+                'q': query,
+                'format': 'json',
+                'no_html': 1,
+                'skip_disambig': 1,
+            }, timeout=10)
             if response.status_code == 200:
-                content = response.text.lower()
+                content = _duckduckgo_answer_text(response.json()).lower()
                 
                 # Buscar géneros en el contenido (géneros más largos primero)
-                for genre in sorted(genres, key=len, reverse=True):
-                    if genre.lower() in content:
-                        # Verificar que no sea parte de otra palabra
-                        genre_lower = genre.lower()
-                        pattern = r'\b' + re.escape(genre_lower) + r'\b'
-                        if re.search(pattern, content):
-                            return genre.title()
+                genre = _GENRE_MATCHER.search(content)
+                if genre:
+                    return genre
         except Exception:
             continue  # Intentar siguiente query
     
@@ -205,22 +617,8 @@ def get_genre_from_database(artist: Optional[str]) -> Optional[str]:
         return None
     
     try:
-        # Buscar todas las canciones del artista
-        songs = db.find_song(artist=artist)
-        if not songs:
-            return None
-        
-        # Contar géneros
-        genre_count = {}
-        for song in songs:
-            genre = song.get('genre')
-            if genre and genre.lower() != 'sin clasificar' and genre.lower() != 'unknown':
-                genre_count[genre] = genre_count.get(genre, 0) + 1
-        
-        if genre_count:
-            # Devolver el género más común
-            most_common = max(genre_count.items(), key=lambda x: x[1])
-            return most_common[0]
+        # Género más frecuente del artista, contado en SQLite
+        return db.get_artist_top_genre(artist)
     except Exception:
         pass
     
@@ -238,28 +636,10 @@ def get_genre_from_video_tags(video_info: Optional[Dict]) -> Optional[str]:
     if not tags:
         return None
     
-    # Géneros comunes de música electrónica/DJ
-    genres = [
-        'drum and bass', 'drum & bass', 'progressive house', 'deep house', 'tech house',
-        'electro house', 'big room', 'future bass', 'bass house', 'melodic house',
-        'progressive trance', 'hard trance', 'uplifting trance', 'vocal trance',
-        'hip hop', 'house', 'techno', 'trance', 'dubstep', 'edm', 'minimal',
-        'hardstyle', 'hardcore', 'electro', 'trap', 'psytrance',
-        'rap', 'r&b', 'pop', 'rock', 'metal', 'jazz', 'blues',
-        'reggae', 'salsa', 'bachata', 'reggaeton', 'latin', 'funk', 'disco',
-        'ambient', 'downtempo', 'chillout', 'lo-fi', 'synthwave', 'vaporwave'
-    ]
-    
     tags_text = ' '.join(tags).lower()
     
     # Buscar géneros en los tags (géneros más largos primero)
-    for genre in sorted(genres, key=len, reverse=True):
-        genre_lower = genre.lower()
-        pattern = r'\b' + re.escape(genre_lower) + r'\b'
-        if re.search(pattern, tags_text):
-            return genre.title()
-    
-    return None
+    return _GENRE_MATCHER.search(tags_text)
 
 
 def get_genre_from_channel_name(video_info: Optional[Dict]) -> Optional[str]:
@@ -270,32 +650,11 @@ def get_genre_from_channel_name(video_info: Optional[Dict]) -> Optional[str]:
     if not video_info:
         return None
     
-    uploader = video_info.get('uploader', '').lower()
-    channel = video_info.get('channel', '').lower()
-    
-    # Mapeo de palabras clave en nombres de canales a géneros
-    channel_keywords = {
-        'house': 'House',
-        'techno': 'Techno',
-        'trance': 'Trance',
-        'dubstep': 'Dubstep',
-        'drum and bass': 'Drum & Bass',
-        'dnb': 'Drum & Bass',
-        'hardstyle': 'Hardstyle',
-        'hardcore': 'Hardcore',
-        'edm': 'EDM',
-        'hip hop': 'Hip Hop',
-        'rap': 'Rap',
-        'reggaeton': 'Reggaeton',
-        'latin': 'Latin',
-        'salsa': 'Salsa',
-        'bachata': 'Bachata',
-    }
-    
-    full_text = (uploader + ' ' + channel).lower()
+    # yt-dlp puede devolver None en estos campos (p. ej. en entradas de playlist)
+    full_text = f"{video_info.get('uploader') or ''} {video_info.get('channel') or ''}".lower()
     
     # Buscar palabras clave (más largas primero)
-    for keyword, genre in sorted(channel_keywords.items(), key=lambda x: len(x[0]), reverse=True):
+    for keyword, genre in _CHANNEL_KEYWORDS_BY_LEN_DESC:
         if keyword in full_text:
             return genre
     
@@ -309,94 +668,8 @@ def get_genre_from_title_keywords(title: str) -> Optional[str]:
     """
     title_lower = title.lower()
     
-    # Mapeo de palabras clave a géneros (ordenado por especificidad)
-    keyword_map = {
-        # Subgéneros específicos primero (más largos)
-        'tribal afro house': 'Afro House',
-        'tribal house': 'Tribal House',
-        'afro house': 'Afro House',
-        'progressive house': 'Progressive House',
-        'deep house': 'Deep House',
-        'tech house': 'Tech House',
-        'electro house': 'Electro House',
-        'future bass': 'Future Bass',
-        'bass house': 'Bass House',
-        'melodic house': 'Melodic House',
-        'big room': 'Big Room',
-        'drum and bass': 'Drum & Bass',
-        'drum & bass': 'Drum & Bass',
-        'progressive trance': 'Progressive Trance',
-        'hard trance': 'Hard Trance',
-        'uplifting trance': 'Uplifting Trance',
-        'vocal trance': 'Vocal Trance',
-        'hip hop': 'Hip Hop',
-        'trap music': 'Trap',
-        'psytrance': 'Psytrance',
-        'hardstyle': 'Hardstyle',
-        'hardcore': 'Hardcore',
-        'minimal techno': 'Minimal Techno',
-        'lo-fi': 'Lo-Fi',
-        'synthwave': 'Synthwave',
-        'vaporwave': 'Vaporwave',
-        'future house': 'Future House',
-        'bassline': 'Bassline',
-        'garage': 'UK Garage',
-        'jungle': 'Jungle',
-        'dub techno': 'Dub Techno',
-        'acid house': 'Acid House',
-        'french house': 'French House',
-        'ghetto house': 'Ghetto House',
-        'baltimore club': 'Baltimore Club',
-        'ghetto tech': 'Ghetto Tech',
-        'footwork': 'Footwork',
-        'juke': 'Juke',
-        'gqom': 'Gqom',
-        'amapiano': 'Amapiano',
-        'afrobeat': 'Afrobeat',
-        'afro tech': 'Afro Tech',
-        'afro': 'Afro House',  # Genérico para afro
-        'tribal': 'Tribal House',  # Genérico para tribal
-        
-        # Géneros principales
-        'house': 'House',
-        'techno': 'Techno',
-        'trance': 'Trance',
-        'dubstep': 'Dubstep',
-        'dnb': 'Drum & Bass',
-        'edm': 'EDM',
-        'rap': 'Rap',
-        'reggaeton': 'Reggaeton',
-        'latin': 'Latin',
-        'salsa': 'Salsa',
-        'bachata': 'Bachata',
-        'progressive': 'Progressive House',
-        'deep': 'Deep House',
-        'tech': 'Tech House',
-        'electro': 'Electro',
-        'trap': 'Trap',
-        'melodic': 'Melodic House',
-        'minimal': 'Minimal',
-        'ambient': 'Ambient',
-        'downtempo': 'Downtempo',
-        'chillout': 'Chillout',
-        'funk': 'Funk',
-        'disco': 'Disco',
-        'r&b': 'R&B',
-        'pop': 'Pop',
-        'rock': 'Rock',
-        'metal': 'Metal',
-        'jazz': 'Jazz',
-        'blues': 'Blues',
-        'reggae': 'Reggae',
-    }
-    
     # Buscar palabras clave (más largas primero)
-    for keyword, genre in sorted(keyword_map.items(), key=lambda x: len(x[0]), reverse=True):
-        pattern = r'\b' + re.escape(keyword) + r'\b'
-        if re.search(pattern, title_lower):
-            return genre
-    
-    return None
+    return _TITLE_KEYWORD_MATCHER.search(title_lower)
 
 
 def get_genre_from_hashtags(description: str, video_info: Optional[Dict] = None) -> Optional[str]:
@@ -416,85 +689,8 @@ def get_genre_from_hashtags(description: str, video_info: Optional[Dict] = None)
     
     text_lower = text_to_search.lower()
     
-    # Géneros comunes en hashtags (ordenados por especificidad)
-    genre_hashtags = {
-        'tribalafrohouse': 'Afro House',
-        'tribalhouse': 'Tribal House',
-        'afrohouse': 'Afro House',
-        'progressivehouse': 'Progressive House',
-        'deephouse': 'Deep House',
-        'techhouse': 'Tech House',
-        'electrohouse': 'Electro House',
-        'futurebass': 'Future Bass',
-        'basshouse': 'Bass House',
-        'melodichouse': 'Melodic House',
-        'bigroom': 'Big Room',
-        'drumandbass': 'Drum & Bass',
-        'drum&bass': 'Drum & Bass',
-        'dnb': 'Drum & Bass',
-        'progressive': 'Progressive House',
-        'hiphop': 'Hip Hop',
-        'trapmusic': 'Trap',
-        'psytrance': 'Psytrance',
-        'hardstyle': 'Hardstyle',
-        'hardcore': 'Hardcore',
-        'minimaltechno': 'Minimal Techno',
-        'lofi': 'Lo-Fi',
-        'synthwave': 'Synthwave',
-        'vaporwave': 'Vaporwave',
-        'futurehouse': 'Future House',
-        'ukgarage': 'UK Garage',
-        'jungle': 'Jungle',
-        'dubtechno': 'Dub Techno',
-        'acidhouse': 'Acid House',
-        'frenchhouse': 'French House',
-        'ghettohouse': 'Ghetto House',
-        'baltimoreclub': 'Baltimore Club',
-        'ghettotech': 'Ghetto Tech',
-        'footwork': 'Footwork',
-        'juke': 'Juke',
-        'gqom': 'Gqom',
-        'amapiano': 'Amapiano',
-        'afrobeat': 'Afrobeat',
-        'afrotech': 'Afro Tech',
-        'house': 'House',
-        'techno': 'Techno',
-        'trance': 'Trance',
-        'dubstep': 'Dubstep',
-        'edm': 'EDM',
-        'rap': 'Rap',
-        'reggaeton': 'Reggaeton',
-        'latin': 'Latin',
-        'salsa': 'Salsa',
-        'bachata': 'Bachata',
-        'trap': 'Trap',
-        'minimal': 'Minimal',
-        'ambient': 'Ambient',
-        'downtempo': 'Downtempo',
-        'chillout': 'Chillout',
-        'funk': 'Funk',
-        'disco': 'Disco',
-        'r&b': 'R&B',
-        'pop': 'Pop',
-        'rock': 'Rock',
-        'metal': 'Metal',
-        'jazz': 'Jazz',
-        'blues': 'Blues',
-        'reggae': 'Reggae',
-    }
-    
     # Buscar hashtags (con y sin #)
-    for hashtag, genre in sorted(genre_hashtags.items(), key=lambda x: len(x[0]), reverse=True):
-        # Buscar como hashtag (#tribalhouse) o como palabra (tribal house)
-        patterns = [
-            r'#' + re.escape(hashtag) + r'\b',
-            r'\b' + re.escape(hashtag.replace('house', ' house').replace('techno', ' techno').replace('trance', ' trance')) + r'\b',
-        ]
-        for pattern in patterns:
-            if re.search(pattern, text_lower, re.IGNORECASE):
-                return genre
-    
-    return None
+    return _HASHTAG_MATCHER.search(text_lower)
 
 
 def get_genre_from_description_deep(description: str) -> Optional[str]:
@@ -505,61 +701,36 @@ def get_genre_from_description_deep(description: str) -> Optional[str]:
     if not description:
         return None
     
-    description_lower = description.lower()
-    
-    # Géneros comunes (expandido)
-    genres = [
-        'tribal afro house', 'tribal house', 'afro house', 'progressive house', 'deep house', 'tech house',
-        'electro house', 'big room', 'future bass', 'bass house', 'melodic house',
-        'progressive trance', 'hard trance', 'uplifting trance', 'vocal trance',
-        'drum and bass', 'drum & bass', 'hip hop', 'house', 'techno', 'trance', 'dubstep', 'edm', 'minimal',
-        'hardstyle', 'hardcore', 'electro', 'trap', 'psytrance',
-        'rap', 'r&b', 'pop', 'rock', 'metal', 'jazz', 'blues',
-        'reggae', 'salsa', 'bachata', 'reggaeton', 'latin', 'funk', 'disco',
-        'ambient', 'downtempo', 'chillout', 'lo-fi', 'synthwave', 'vaporwave',
-        'future house', 'bassline', 'uk garage', 'jungle', 'dub techno', 'acid house',
-        'french house', 'ghetto house', 'baltimore club', 'ghetto tech', 'footwork',
-        'juke', 'gqom', 'amapiano', 'afrobeat', 'afro tech'
-    ]
-    
+    return _genre_from_description_lower(description.lower())
+
+
+def _genre_from_description_lower(description_lower: str) -> Optional[str]:
+    """Núcleo de get_genre_from_description_deep sobre la descripción ya en minúsculas."""
     # Buscar patrones comunes donde se menciona el género
-    genre_patterns = [
-        r'genre[:\s]+([^\n,\.]+)',
-        r'style[:\s]+([^\n,\.]+)',
-        r'categor[yi][:\s]+([^\n,\.]+)',
-        r'type[:\s]+([^\n,\.]+)',
-        r'#([^\s#]+)',  # Hashtags
-    ]
-    
-    for pattern in genre_patterns:
-        matches = re.findall(pattern, description_lower, re.IGNORECASE)
-        for match in matches:
+    for pattern in _DESCRIPTION_GENRE_PATTERNS:
+        for match in pattern.findall(description_lower):
             match_text = match.strip()
             # Buscar géneros en el match (géneros más largos primero)
-            for genre in sorted(genres, key=len, reverse=True):
-                genre_lower = genre.lower()
-                if genre_lower in match_text:
-                    pattern_boundary = r'\b' + re.escape(genre_lower) + r'\b'
-                    if re.search(pattern_boundary, match_text):
-                        return genre.title()
+            genre = _GENRE_MATCHER.search(match_text)
+            if genre:
+                return genre
     
     # Si no se encontró en patrones específicos, buscar directamente en la descripción
-    for genre in sorted(genres, key=len, reverse=True):
-        genre_lower = genre.lower()
-        pattern = r'\b' + re.escape(genre_lower) + r'\b'
-        if re.search(pattern, description_lower):
-            return genre.title()
-    
-    return None
+    return _GENRE_MATCHER.search(description_lower)
 
 
+@_cached_genre_lookup('musicbrainz')
 def get_genre_from_musicbrainz(artist: str, track: str) -> Optional[str]:
     """
     Intenta obtener el género usando MusicBrainz API.
+    Si ya se hizo una petición en el último segundo, se salta la consulta.
     """
     if not REQUESTS_AVAILABLE:
         return None
     
+    if not _MUSICBRAINZ_LIMITER.try_acquire():
+        raise _LookupSkipped('musicbrainz')
+    
     try:
         # MusicBrainz API (sin API key necesario, pero con rate limiting)
         search_url = "https://musicbrainz.org/ws/2/recording/"
@@ -569,30 +740,40 @@ def get_genre_from_musicbrainz(artist: str, track: str) -> Optional[str]:
             'limit': 1
         }
         
-        headers = {
-            'User-Agent': 'YouTubeMusicDownloader/1.0 (https://example.com)',
-            'Accept': 'application/json'
-        }
-        
-        response = requests.get(search_url, params=params, headers=headers, timeout=5)
+        response = _HTTP_SESSION.get(search_url, params=params, headers=_MUSICBRAINZ_HEADERS, timeout=5)
         if response.status_code == 200:
             data = response.json()
-            if 'recordings' in data and len(data['recordings']) > 0:
+            if data.get('recordings'):
                 recording = data['recordings'][0]
-                # Buscar tags/genres en el recording
-                if 'tags' in recording and len(recording['tags']) > 0:
-                    # Devolver el tag más popular
-                    tags = sorted(recording['tags'], key=lambda x: x.get('count', 0), reverse=True)
-                    if tags:
-                        genre = tags[0].get('name', '').title()
-                        if genre and len(genre) > 2:
-                            return genre
+                # Devolver el tag más popular del recording
+                top_tag = max(recording.get('tags') or [], key=lambda x: x.get('count', 0), default=None)
+                if top_tag:
+                    genre = top_tag.get('name', '').title()
+                    if genre and len(genre) > 2:
+                        return genre
     except Exception:
         pass  # Silenciosamente fallar
     
     return None
 
 
+def _read_text_prefix(response, limit: int = HTML_READ_LIMIT) -> str:
+    """
+    Lee como mucho `limit` bytes de una respuesta abierta con stream=True y los
+    decodifica. Las menciones de género suelen estar en las etiquetas meta y
+    cabeceras del principio de la página, así que no hace falta descargarla entera.
+    """
+    chunks = []
+    remaining = limit
+    for chunk in response.iter_content(chunk_size=8192):
+        chunks.append(chunk[:remaining])
+        remaining -= len(chunk)
+        if remaining <= 0:
+            break
+    return b''.join(chunks).decode(response.encoding or 'utf-8', errors='ignore')
+
+
+@_cached_genre_lookup('spotify')
 def get_genre_from_spotify_search(artist: Optional[str], track: str) -> Optional[str]:
     """
     Busca el género en Spotify usando búsqueda web (sin API).
@@ -603,44 +784,129 @@ def get_genre_from_spotify_search(artist: Optional[str], track: str) -> Optional
     try:
         # Buscar en Spotify vía web scraping
         search_url = f"https://open.spotify.com/search/{urllib.parse.quote(f'{artist} {track}')}"
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36'
-        }
-        
-        response = requests.get(search_url, headers=headers, timeout=5)
-        if response.status_code == 200:
-            content = response.text.lower()
-            
-            # Géneros a buscar
-            genres = [
-                'tribal afro house', 'tribal house', 'afro house', 'progressive house', 'deep house', 'tech house',
-                'electro house', 'big room', 'future bass', 'bass house', 'melodic house',
-                'progressive trance', 'hard trance', 'uplifting trance', 'vocal trance',
-                'drum and bass', 'drum & bass', 'hip hop', 'house', 'techno', 'trance', 'dubstep', 'edm', 'minimal',
-                'hardstyle', 'hardcore', 'electro', 'trap', 'psytrance',
-                'rap', 'r&b', 'pop', 'rock', 'metal', 'jazz', 'blues',
-                'reggae', 'salsa', 'bachata', 'reggaeton', 'latin', 'funk', 'disco',
-                'ambient', 'downtempo', 'chillout', 'lo-fi', 'synthwave', 'vaporwave',
-                'future house', 'bassline', 'uk garage', 'jungle', 'dub techno', 'acid house',
-                'french house', 'ghetto house', 'baltimore club', 'ghetto tech', 'footwork',
-                'juke', 'gqom', 'amapiano', 'afrobeat', 'afro tech'
-            ]
-            
-            for genre in sorted(genres, key=len, reverse=True):
-                pattern = r'\b' + re.escape(genre.lower()) + r'\b'
-                if re.search(pattern, content):
-                    return genre.title()
+        with _HTTP_SESSION.get(search_url, timeout=5, stream=True) as response:
+            if response.status_code == 200:
+                content = _read_text_prefix(response).lower()
+                
+                genre = _GENRE_MATCHER.search(content)
+                if genre:
+                    return genre
     except Exception:
         pass
     
     return None
 
 
+def _middle_excerpt(audio, sample_rate: int, seconds: int):
+    """
+    Devuelve un fragmento de `seconds` segundos del centro del audio
+    (o el audio completo si es más corto).
+    """
+    length = int(sample_rate * seconds)
+    if len(audio) <= length:
+        return audio
+    start = (len(audio) - length) // 2
+    return audio[start:start + length]
+
+
+# Mapeo de etiquetas comunes de Essentia a géneros del proyecto
+_ESSENTIA_GENRE_MAPPING = {
+    # Electronic
+    'electronic': 'Electronic',
+    'house': 'House',
+    'techno': 'Techno',
+    'trance': 'Trance',
+    'dubstep': 'Dubstep',
+    'drum and bass': 'Drum & Bass',
+    'drum & bass': 'Drum & Bass',
+    'dnb': 'Drum & Bass',
+    'hardstyle': 'Hardstyle',
+    'hardcore': 'Hardcore',
+    'progressive house': 'Progressive House',
+    'deep house': 'Deep House',
+    'tech house': 'Tech House',
+    'electro house': 'Electro House',
+    'future bass': 'Future Bass',
+    'bass house': 'Bass House',
+    'melodic house': 'Melodic House',
+    'big room': 'Big Room',
+    'progressive trance': 'Progressive Trance',
+    'hard trance': 'Hard Trance',
+    'uplifting trance': 'Uplifting Trance',
+    'vocal trance': 'Vocal Trance',
+    'psytrance': 'Psytrance',
+    'minimal': 'Minimal',
+    'minimal techno': 'Minimal Techno',
+    'edm': 'EDM',
+    'trap': 'Trap',
+    'ambient': 'Ambient',
+    'downtempo': 'Downtempo',
+    'chillout': 'Chillout',
+    'lo-fi': 'Lo-Fi',
+    'synthwave': 'Synthwave',
+    'vaporwave': 'Vaporwave',
+    'future house': 'Future House',
+    'uk garage': 'UK Garage',
+    'jungle': 'Jungle',
+    'dub techno': 'Dub Techno',
+    'acid house': 'Acid House',
+    'french house': 'French House',
+    'ghetto house': 'Ghetto House',
+    'baltimore club': 'Baltimore Club',
+    'ghetto tech': 'Ghetto Tech',
+    'footwork': 'Footwork',
+    'juke': 'Juke',
+    'gqom': 'Gqom',
+    'amapiano': 'Amapiano',
+    'afrobeat': 'Afrobeat',
+    'afro tech': 'Afro Tech',
+    'afro house': 'Afro House',
+    'tribal house': 'Tribal House',
+
+    # Other genres
+    'hip hop': 'Hip Hop',
+    'hip-hop': 'Hip Hop',
+    'rap': 'Rap',
+    'r&b': 'R&B',
+    'r and b': 'R&B',
+    'pop': 'Pop',
+    'rock': 'Rock',
+    'metal': 'Metal',
+    'jazz': 'Jazz',
+    'blues': 'Blues',
+    'reggae': 'Reggae',
+    'reggaeton': 'Reggaeton',
+    'latin': 'Latin',
+    'salsa': 'Salsa',
+    'bachata': 'Bachata',
+    'funk': 'Funk',
+    'disco': 'Disco',
+}
+
+
+def _map_essentia_tag(tag_name: str) -> Optional[str]:
+    """
+    Traduce una etiqueta de Essentia (en minúsculas) a un género del proyecto:
+    primero por coincidencia exacta y, si no, por inclusión en cualquier sentido.
+    """
+    genre = _ESSENTIA_GENRE_MAPPING.get(tag_name)
+    if genre:
+        return genre
+    for key, genre in _ESSENTIA_GENRE_MAPPING.items():
+        if key in tag_name or tag_name in key:
+            return genre
+    return None
+
+
 def get_genre_from_essentia(file_path: str) -> Optional[str]:
     """
     Detecta el género musical analizando el archivo de audio con Essentia.
     Usa modelos TensorFlow preentrenados (Discogs-EffNet) si están disponibles.
     
+    El género detectado se recuerda por ruta, tamaño y fecha de modificación: al importar,
+    el mismo archivo puede pasar varias veces por aquí y el análisis tarda segundos.
+    Si no se detecta género (o el análisis falla) no se guarda, y se reintenta.
+    
     Args:
         file_path: Ruta al archivo de audio (MP3, WAV, etc.)
     
@@ -650,9 +916,49 @@ def get_genre_from_essentia(file_path: str) -> Optional[str]:
     if not ESSENTIA_AVAILABLE:
         return None
     
-    if not Path(file_path).exists():
+    future = _submit_essentia_genre(file_path)
+    return future.result() if future is not None else None
+
+
+# (ruta real, tamaño, mtime_ns) -> género detectado por get_genre_from_essentia
+_ESSENTIA_GENRE_MEMO: Dict[Tuple[str, int, int], str] = {}
+
+
+def _submit_essentia_genre(file_path: str) -> Optional[Future]:
+    """
+    Encola el análisis de get_genre_from_essentia en _AUDIO_ANALYSIS_EXECUTOR: los
+    algoritmos de Essentia (y el modelo TF compartido) no son seguros entre threads,
+    así que todo análisis pasa por su único thread, lo llame quien lo llame.
+    
+    Returns:
+        Future con el género (ya resuelto si estaba en memoria), o None si no hay archivo
+    """
+    try:
+        stat = os.stat(file_path)
+    except OSError:
         return None
+    real_path = os.path.realpath(file_path)
+    key = (real_path, stat.st_size, stat.st_mtime_ns)
+    genre = _ESSENTIA_GENRE_MEMO.get(key)
+    if genre is not None:
+        future = Future()
+        future.set_result(genre)
+        return future
+    
+    def remember(done: Future):
+        genre = done.result() if done.exception() is None else None
+        if genre:
+            if len(_ESSENTIA_GENRE_MEMO) >= ESSENTIA_GENRE_MEMO_SIZE:
+                _ESSENTIA_GENRE_MEMO.clear()
+            _ESSENTIA_GENRE_MEMO[key] = genre
     
+    future = _AUDIO_ANALYSIS_EXECUTOR.submit(_analyze_essentia_genre, real_path)
+    future.add_done_callback(remember)
+    return future
+
+
+def _analyze_essentia_genre(file_path: str) -> Optional[str]:
+    """Análisis con Essentia de get_genre_from_essentia, sin memoria."""
     # 1. Intentar usar el clasificador TensorFlow (más preciso)
     if TF_CLASSIFIER_AVAILABLE:
         try:
@@ -666,9 +972,9 @@ def get_genre_from_essentia(file_path: str) -> Optional[str]:
     try:
         # Fallback: Implementación original con TaggerMusicNN (si TF falla o no da resultado)
         print("   ⏳ Analizando audio con Essentia (Legacy MusicNN)...")
-        # Cargar el archivo de audio
-        loader = es.MonoLoader(filename=file_path)
-        audio = loader()
+        # Cargar el archivo de audio y quedarse con un fragmento central
+        loader = es.MonoLoader(filename=file_path, sampleRate=ESSENTIA_SAMPLE_RATE)
+        audio = _middle_excerpt(loader(), ESSENTIA_SAMPLE_RATE, ESSENTIA_EXCERPT_SECONDS)
         
         # Intentar usar TaggerMusicNN (modelo preentrenado para clasificación)
         # Este modelo clasifica en múltiples etiquetas incluyendo géneros
@@ -676,80 +982,6 @@ def get_genre_from_essentia(file_path: str) -> Optional[str]:
             tagger = es.TaggerMusicNN()
             predictions = tagger(audio)
             
-            # Mapeo de etiquetas comunes de Essentia a géneros del proyecto
-            genre_mapping = {
-                # Electronic
-                'electronic': 'Electronic',
-                'house': 'House',
-                'techno': 'Techno',
-                'trance': 'Trance',
-                'dubstep': 'Dubstep',
-                'drum and bass': 'Drum & Bass',
-                'drum & bass': 'Drum & Bass',
-                'dnb': 'Drum & Bass',
-                'hardstyle': 'Hardstyle',
-                'hardcore': 'Hardcore',
-                'progressive house': 'Progressive House',
-                'deep house': 'Deep House',
-                'tech house': 'Tech House',
-                'electro house': 'Electro House',
-                'future bass': 'Future Bass',
-                'bass house': 'Bass House',
-                'melodic house': 'Melodic House',
-                'big room': 'Big Room',
-                'progressive trance': 'Progressive Trance',
-                'hard trance': 'Hard Trance',
-                'uplifting trance': 'Uplifting Trance',
-                'vocal trance': 'Vocal Trance',
-                'psytrance': 'Psytrance',
-                'minimal': 'Minimal',
-                'minimal techno': 'Minimal Techno',
-                'edm': 'EDM',
-                'trap': 'Trap',
-                'ambient': 'Ambient',
-                'downtempo': 'Downtempo',
-                'chillout': 'Chillout',
-                'lo-fi': 'Lo-Fi',
-                'synthwave': 'Synthwave',
-                'vaporwave': 'Vaporwave',
-                'future house': 'Future House',
-                'uk garage': 'UK Garage',
-                'jungle': 'Jungle',
-                'dub techno': 'Dub Techno',
-                'acid house': 'Acid House',
-                'french house': 'French House',
-                'ghetto house': 'Ghetto House',
-                'baltimore club': 'Baltimore Club',
-                'ghetto tech': 'Ghetto Tech',
-                'footwork': 'Footwork',
-                'juke': 'Juke',
-                'gqom': 'Gqom',
-                'amapiano': 'Amapiano',
-                'afrobeat': 'Afrobeat',
-                'afro tech': 'Afro Tech',
-                'afro house': 'Afro House',
-                'tribal house': 'Tribal House',
-                
-                # Other genres
-                'hip hop': 'Hip Hop',
-                'hip-hop': 'Hip Hop',
-                'rap': 'Rap',
-                'r&b': 'R&B',
-                'r and b': 'R&B',
-                'pop': 'Pop',
-                'rock': 'Rock',
-                'metal': 'Metal',
-                'jazz': 'Jazz',
-                'blues': 'Blues',
-                'reggae': 'Reggae',
-                'reggaeton': 'Reggaeton',
-                'latin': 'Latin',
-                'salsa': 'Salsa',
-                'bachata': 'Bachata',
-                'funk': 'Funk',
-                'disco': 'Disco',
-            }
-            
             # Buscar el género con mayor probabilidad
             if isinstance(predictions, dict):
                 # Si es un diccionario, buscar la etiqueta con mayor valor
@@ -757,9 +989,9 @@ def get_genre_from_essentia(file_path: str) -> Optional[str]:
                 tag_name = best_tag[0].lower()
                 
                 # Buscar en el mapeo
-                for key, genre in genre_mapping.items():
-                    if key.lower() in tag_name or tag_name in key.lower():
-                        return genre
+                genre = _map_essentia_tag(tag_name)
+                if genre:
+                    return genre
                 
                 # Si no está en el mapeo pero parece un género, devolverlo capitalizado
                 if best_tag[1] > 0.3:  # Umbral de confianza
@@ -773,75 +1005,20 @@ def get_genre_from_essentia(file_path: str) -> Optional[str]:
                         confidence = float(tag[1]) if len(tag) > 1 else 0.0
                         
                         if confidence > 0.3:  # Umbral de confianza
-                            for key, genre in genre_mapping.items():
-                                if key.lower() in tag_name or tag_name in key.lower():
-                                    return genre
-                    elif isinstance(tag, str):
-                        tag_lower = tag.lower()
-                        for key, genre in genre_mapping.items():
-                            if key.lower() in tag_lower or tag_lower in key.lower():
+                            genre = _map_essentia_tag(tag_name)
+                            if genre:
                                 return genre
+                    elif isinstance(tag, str):
+                        genre = _map_essentia_tag(tag.lower())
+                        if genre:
+                            return genre
             
         except (AttributeError, RuntimeError, Exception) as e:
             # Si TaggerMusicNN no está disponible, usar análisis de características básicas
             pass
         
-        # Método alternativo: análisis de características de audio
-        # Extraer características que pueden indicar el género
-        try:
-            # Extraer tempo (BPM)
-            rhythm_extractor = es.RhythmExtractor2013(method="multifeature")
-            bpm, beats, beats_confidence, _, beats_intervals = rhythm_extractor(audio)
-            
-            # Extraer key (tonalidad)
-            key_extractor = es.KeyExtractor()
-            key, scale, strength = key_extractor(audio)
-            
-            # Extraer características espectrales (opcional, puede no estar disponible)
-            avg_centroid = 0
-            try:
-                spectral_centroid = es.SpectralCentroid()
-                centroid = spectral_centroid(audio)
-                avg_centroid = float(sum(centroid) / len(centroid)) if len(centroid) > 0 else 0
-            except (AttributeError, Exception):
-                # SpectralCentroid no está disponible, usar valor por defecto
-                pass
-            
-            # Extraer energía
-            energy = es.Energy()
-            energy_value = energy(audio)
-            avg_energy = float(sum(energy_value) / len(energy_value)) if len(energy_value) > 0 else 0
-            
-            # Reglas heurísticas para géneros electrónicos comunes
-            if bpm >= 120 and bpm <= 130:
-                if avg_energy > 0.5:
-                    return 'House'
-                else:
-                    return 'Deep House'
-            elif bpm >= 130 and bpm <= 140:
-                if avg_energy > 0.6:
-                    return 'Techno'
-                else:
-                    return 'Tech House'
-            elif bpm >= 138 and bpm <= 145:
-                return 'Trance'
-            elif bpm >= 160 and bpm <= 180:
-                return 'Drum & Bass'
-            elif bpm >= 140 and bpm <= 150:
-                if avg_energy > 0.7:
-                    return 'Dubstep'
-                else:
-                    return 'Trap'
-            elif bpm < 100:
-                if avg_energy < 0.3:
-                    return 'Ambient'
-                else:
-                    return 'Downtempo'
-            
-        except Exception as e:
-            # Si falla el análisis de características, devolver None
-            pass
-        
+        # Sin etiqueta de MusicNN no se estima el género (tempo y energía no bastan para
+        # decidirlo): el archivo queda sin clasificar
         return None
         
     except Exception as e:
@@ -849,6 +1026,71 @@ def get_genre_from_essentia(file_path: str) -> Optional[str]:
         return None
 
 
+def _detect_genre_from_local_signals(artist: Optional[str], video_info: Optional[Dict],
+                                     title: Optional[str], description: Optional[str]
+                                     ) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Prueba las fuentes locales en orden de prioridad (la primera que encuentra género gana):
+    base de datos, hashtags, tags del video, nombre del canal, título y descripción.
+    La descripción y los tags se pasan a minúsculas una sola vez para todas ellas.
+    
+    Returns:
+        (género, fuente) o (None, None)
+    """
+    description_lower = description.lower() if description else ''
+    tags = (video_info or {}).get('tags') or []
+    tags_lower = ' '.join(tags).lower()
+    
+    checks = (
+        ('base de datos local', lambda: get_genre_from_database(artist)),
+        ('hashtags', lambda: _HASHTAG_MATCHER.search(f"{description_lower} {tags_lower}")
+            if description_lower or tags_lower else None),
+        ('tags del video', lambda: _GENRE_MATCHER.search(tags_lower) if tags_lower else None),
+        ('nombre del canal', lambda: get_genre_from_channel_name(video_info)),
+        ('palabras clave del título', lambda: get_genre_from_title_keywords(title) if title else None),
+        ('análisis de descripción', lambda: _genre_from_description_lower(description_lower)
+            if description_lower else None),
+    )
+    for source, check in checks:
+        genre = check()
+        if genre:
+            return genre, source
+    return None, None
+
+
+def _detect_genre_from_online_sources(artist: str, track: str) -> Tuple[Optional[str], Optional[str]]:
+    """
+    Consulta a la vez Last.fm, MusicBrainz, Spotify y la búsqueda web.
+    Devuelve (género, fuente) de la primera fuente, por orden de prioridad, que encuentre
+    un género; así el tiempo total es el de la fuente más lenta y no la suma de todas.
+    """
+    stop_event = threading.Event()
+    sources = [
+        ('Last.fm', get_genre_from_lastfm, ()),
+        ('MusicBrainz', get_genre_from_musicbrainz, ()),
+        ('Spotify', get_genre_from_spotify_search, ()),
+        ('búsqueda web', get_genre_from_web_search, (stop_event,)),
+    ]
+    futures = [(name, _GENRE_LOOKUP_EXECUTOR.submit(func, artist, track, *extra))
+               for name, func, extra in sources]
+    try:
+        deadline = time.monotonic() + ONLINE_GENRE_TIMEOUT
+        for name, future in futures:
+            try:
+                genre = future.result(timeout=max(0.0, deadline - time.monotonic()))
+            except Exception:
+                # Timeout o error de la fuente: probar la siguiente
+                continue
+            if genre:
+                return genre, name
+        return None, None
+    finally:
+        # No esperar a las fuentes que sigan en marcha
+        stop_event.set()
+        for _, future in futures:
+            future.cancel()
+
+
 def detect_genre_online(artist: Optional[str], track: str, video_info: Optional[Dict] = None, 
                         title: Optional[str] = None, description: Optional[str] = None) -> Optional[str]:
     """
@@ -857,81 +1099,39 @@ def detect_genre_online(artist: Optional[str], track: str, video_info: Optional[
     """
     print("🔍 Buscando género de la canción...")
     
-    # 1. Buscar en la base de datos local (género histórico del artista)
-    if artist:
-        genre = get_genre_from_database(artist)
-        if genre:
-            print(f"   ✓ Género encontrado (base de datos local): {genre}")
-            return genre
-    
-    # 2. Buscar en hashtags (descripción + tags del video)
-    if description or video_info:
-        genre = get_genre_from_hashtags(description or "", video_info)
-        if genre:
-            print(f"   ✓ Género encontrado (hashtags): {genre}")
-            return genre
-    
-    # 3. Buscar en tags del video de YouTube
-    if video_info:
-        genre = get_genre_from_video_tags(video_info)
-        if genre:
-            print(f"   ✓ Género encontrado (tags del video): {genre}")
-            return genre
-    
-    # 4. Buscar en nombre del canal
-    if video_info:
-        genre = get_genre_from_channel_name(video_info)
-        if genre:
-            print(f"   ✓ Género encontrado (nombre del canal): {genre}")
-            return genre
-    
-    # 5. Analizar palabras clave del título (mejorado)
-    if title:
-        genre = get_genre_from_title_keywords(title)
-        if genre:
-            print(f"   ✓ Género encontrado (palabras clave del título): {genre}")
-            return genre
-    
-    # 6. Análisis profundo de la descripción
-    if description:
-        genre = get_genre_from_description_deep(description)
-        if genre:
-            print(f"   ✓ Género encontrado (análisis de descripción): {genre}")
-            return genre
-    
-    # 7. Intentar con Last.fm
-    if artist:
-        genre = get_genre_from_lastfm(artist, track)
-        if genre:
-            print(f"   ✓ Género encontrado (Last.fm): {genre}")
-            return genre
-    
-    # 8. Intentar con MusicBrainz
-    if artist:
-        genre = get_genre_from_musicbrainz(artist, track)
-        if genre:
-            print(f"   ✓ Género encontrado (MusicBrainz): {genre}")
-            return genre
-    
-    # 9. Buscar en Spotify (búsqueda web)
-    if artist:
-        genre = get_genre_from_spotify_search(artist, track)
-        if genre:
-            print(f"   ✓ Género encontrado (Spotify): {genre}")
-            return genre
+    # 1-6. Señales locales (base de datos, hashtags, tags, canal, título y descripción)
+    genre, source = _detect_genre_from_local_signals(artist, video_info, title, description)
+    if genre:
+        print(f"   ✓ Género encontrado ({source}): {genre}")
+        return genre
     
-    # 10. Búsqueda web como último recurso
+    # 7-10. Fuentes online (Last.fm, MusicBrainz, Spotify y búsqueda web) en paralelo
     if artist:
-        genre = get_genre_from_web_search(artist, track)
+        genre, source = _detect_genre_from_online_sources(artist, track)
         if genre:
-            print(f"   ✓ Género encontrado (búsqueda web): {genre}")
+            print(f"   ✓ Género encontrado ({source}): {genre}")
             return genre
     
     print("   ⚠️  No se pudo detectar el género automáticamente")
     return None
 
 
-def detect_genre_from_audio_file(file_path: str, log_callback=None) -> Optional[str]:
+def start_audio_genre_detection(file_path: str) -> Optional[Future]:
+    """
+    Lanza el análisis de audio con Essentia en segundo plano, para solaparlo con
+    otras tareas (p. ej. la detección online). El resultado se recoge pasando el
+    Future devuelto a detect_genre_from_audio_file(..., pending=future).
+    
+    Returns:
+        Future con el género (o None), o None si Essentia no está disponible
+    """
+    if not ESSENTIA_AVAILABLE:
+        return None
+    return _submit_essentia_genre(str(file_path))
+
+
+def detect_genre_from_audio_file(file_path: str, log_callback=None,
+                                 pending: Optional[Future] = None) -> Optional[str]:
     """
     Detecta el género usando análisis de audio con Essentia.
     Esta función debe llamarse DESPUÉS de descargar el archivo.
@@ -939,6 +1139,7 @@ def detect_genre_from_audio_file(file_path: str, log_callback=None) -> Optional[
     Args:
         file_path: Ruta al archivo de audio descargado
         log_callback: Función opcional para logging (recibe un string). Si es None, usa print()
+        pending: Future de start_audio_genre_detection() si el análisis ya está en marcha
     
     Returns:
         Género detectado o None
@@ -957,7 +1158,7 @@ def detect_genre_from_audio_file(file_path: str, log_callback=None) -> Optional[
     else:
         print(log_msg)
     
-    genre = get_genre_from_essentia(file_path)
+    genre = pending.result() if pending is not None else get_genre_from_essentia(file_path)
     
     if genre:
         log_msg = f"   ✓ Género detectado (análisis de audio Essentia): {genre}"
@@ -975,6 +1176,10 @@ def detect_genre_from_audio_file(file_path: str, log_callback=None) -> Optional[
         return None
 
 
+# Nombres de década precalculados (1900s-2190s) para no formatear en cada llamada
+_DECADE_LABELS = {decade: f"{decade}s" for decade in range(1900, 2200, 10)}
+
+
 def get_decade_from_year(year: Optional[str]) -> str:
     """
     Obtiene la década a partir del año.
@@ -984,11 +1189,10 @@ def get_decade_from_year(year: Optional[str]) -> str:
         return 'Unknown'
     
     try:
-        year_int = int(year)
-        decade = (year_int // 10) * 10
-        return f"{decade}s"
+        decade = (int(year) // 10) * 10
     except (ValueError, TypeError):
         return 'Unknown'
+    return _DECADE_LABELS.get(decade) or f"{decade}s"
 
 
 def get_output_folder(base_folder: str, genre: Optional[str], year: Optional[str]) -> Path:
@@ -1014,6 +1218,39 @@ def get_output_folder(base_folder: str, genre: Optional[str], year: Optional[str
     return output_folder
 
 
+# Expresiones regulares precompiladas para metadatos, nombres de archivo y URLs
+_FOUR_DIGITS_RE = re.compile(r'(\d{4})')
+_YEAR_RE = re.compile(r'\b(19|20)\d{2}\b')
+_YEAR_STRIP_RE = re.compile(r'\s*[\(\[\-]?\s*(19|20)\d{2}\s*[\)\]\-]?\s*')
+_DASH_SPLIT_RE = re.compile(r'\s*[-–—]\s*')
+# Patrones como "Artist:", "Artista:", "By:", etc. en la descripción
+_ARTIST_PATTERNS = tuple(re.compile(p, re.IGNORECASE | re.MULTILINE) for p in (
+    r'(?:Artist|Artista|By|Por|Performer|Intérprete)[:\s]+([^\n]+)',
+    r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*[-–—]',  # Nombre propio al inicio
+))
+_INVALID_FILENAME_CHARS_RE = re.compile(r'[<>:"/\\|?*]')
+_WHITESPACE_RUN_RE = re.compile(r'\s+')
+_MEAN_VOLUME_RE = re.compile(r'mean_volume:\s*([-\d.]+)\s*dB')
+_VIDEO_ID_IN_URL_RE = re.compile(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*')
+_WATCH_URL_PREFIX = 'https://www.youtube.com/watch?v='
+_CLEAN_YT_URL_RE = re.compile(r'https://www\.youtube\.com/watch\?v=[0-9A-Za-z_-]{11}')
+
+# Géneros que se consideran "sin género" al importar (se intenta detectar uno real)
+_GENERIC_GENRES = frozenset(('', 'sin clasificar', 'unknown', 'desconocido'))
+
+# Géneros comunes de música electrónica/DJ que se buscan en título y descripción,
+# en orden de prioridad, como pares (minúsculas, nombre)
+_TITLE_METADATA_GENRES = tuple((genre.lower(), genre) for genre in (
+    'House', 'Techno', 'Trance', 'Dubstep', 'Drum & Bass', 'Drum and Bass',
+    'EDM', 'Progressive House', 'Deep House', 'Tech House', 'Minimal',
+    'Hardstyle', 'Hardcore', 'Electro', 'Electro House', 'Big Room',
+    'Trap', 'Future Bass', 'Bass House', 'Melodic House', 'Progressive Trance',
+    'Psytrance', 'Hard Trance', 'Uplifting Trance', 'Vocal Trance',
+    'Hip Hop', 'Rap', 'R&B', 'Pop', 'Rock', 'Metal', 'Jazz', 'Blues',
+    'Reggae', 'Salsa', 'Bachata', 'Reggaeton', 'Latin', 'Funk', 'Disco'
+))
+
+
 def extract_metadata_from_title(title: str, description: str = "", video_info: Optional[Dict] = None) -> Dict[str, Optional[str]]:
     """
     Extrae metadatos del título y descripción del video de YouTube.
@@ -1042,14 +1279,18 @@ def extract_metadata_from_title(title: str, description: str = "", video_info: O
             release_date = video_info.get('release_date')
             # release_date puede estar en formato YYYYMMDD o YYYY-MM-DD
             if isinstance(release_date, str):
-                year_match = re.search(r'(\d{4})', release_date)
-                if year_match:
-                    metadata['year'] = year_match.group(1)
+                # Caso habitual: el año son los 4 primeros caracteres
+                if len(release_date) >= 4 and release_date[:4].isdecimal():
+                    metadata['year'] = release_date[:4]
+                else:
+                    year_match = _FOUR_DIGITS_RE.search(release_date)
+                    if year_match:
+                        metadata['year'] = year_match.group(1)
             elif isinstance(release_date, (int, float)):
                 # Si es un timestamp o número, extraer año
                 date_str = str(int(release_date))
                 if len(date_str) >= 4:
-                    year_match = re.search(r'(\d{4})', date_str)
+                    year_match = _FOUR_DIGITS_RE.search(date_str)
                     if year_match:
                         year = int(year_match.group(1))
                         if 1900 <= year <= 2100:
@@ -1075,16 +1316,16 @@ def extract_metadata_from_title(title: str, description: str = "", video_info: O
     
     # Si no se encontró año en los metadatos, intentar extraer del título
     if not metadata['year']:
-        year_match = re.search(r'\b(19|20)\d{2}\b', title)
+        year_match = _YEAR_RE.search(title)
         if year_match:
             metadata['year'] = year_match.group()
             # Remover el año del título para limpiarlo
-            title = re.sub(r'\s*[\(\[\-]?\s*(19|20)\d{2}\s*[\)\]\-]?\s*', '', title)
+            title = _YEAR_STRIP_RE.sub('', title)
     
     # Patrones comunes de formato: "Artista - Canción"
     # Primero intentar con guión como separador
     if ' - ' in title or ' – ' in title or ' — ' in title:
-        parts = re.split(r'\s*[-–—]\s*', title, maxsplit=1)
+        parts = _DASH_SPLIT_RE.split(title, maxsplit=1)
         if len(parts) == 2:
             # Asumir que el primer parte es el artista
             metadata['artist'] = parts[0].strip()
@@ -1093,41 +1334,177 @@ def extract_metadata_from_title(title: str, description: str = "", video_info: O
     # Si no se encontró artista, buscar en la descripción
     if not metadata['artist'] and description:
         # Buscar patrones como "Artist:", "Artista:", "By:", etc.
-        artist_patterns = [
-            r'(?:Artist|Artista|By|Por|Performer|Intérprete)[:\s]+([^\n]+)',
-            r'^([A-Z][a-z]+(?:\s+[A-Z][a-z]+)*)\s*[-–—]',  # Nombre propio al inicio
-        ]
-        for pattern in artist_patterns:
-            match = re.search(pattern, description, re.IGNORECASE | re.MULTILINE)
+        for pattern in _ARTIST_PATTERNS:
+            match = pattern.search(description)
             if match:
                 metadata['artist'] = match.group(1).strip()
                 break
     
     # Intentar extraer género de la descripción o título
-    # Géneros comunes de música electrónica/DJ
-    genres = [
-        'House', 'Techno', 'Trance', 'Dubstep', 'Drum & Bass', 'Drum and Bass',
-        'EDM', 'Progressive House', 'Deep House', 'Tech House', 'Minimal',
-        'Hardstyle', 'Hardcore', 'Electro', 'Electro House', 'Big Room',
-        'Trap', 'Future Bass', 'Bass House', 'Melodic House', 'Progressive Trance',
-        'Psytrance', 'Hard Trance', 'Uplifting Trance', 'Vocal Trance',
-        'Hip Hop', 'Rap', 'R&B', 'Pop', 'Rock', 'Metal', 'Jazz', 'Blues',
-        'Reggae', 'Salsa', 'Bachata', 'Reggaeton', 'Latin', 'Funk', 'Disco'
-    ]
-    
     full_text = (title + ' ' + description).lower()
-    for genre in genres:
-        if genre.lower() in full_text:
+    for genre_lower, genre in _TITLE_METADATA_GENRES:
+        if genre_lower in full_text:
             metadata['genre'] = genre
             break
     
     return metadata
 
 
+# Información de videos ya consultada en esta ejecución, por video_id
+_VIDEO_INFO_MEMO: Dict[str, Dict] = {}
+# Campos voluminosos de yt-dlp que el resto del código no usa: no se guardan en caché
+_VIDEO_INFO_UNCACHED_KEYS = ('formats', 'requested_formats', 'thumbnails',
+                             'automatic_captions', 'subtitles', 'heatmap')
+
+
+def _extract_video_id(url: str) -> Optional[str]:
+    """Obtiene el video_id de una URL de YouTube, o None si no es la URL de un video."""
+    clean_url = clean_youtube_url(url)
+    if clean_url and clean_url.startswith(_WATCH_URL_PREFIX):
+        return clean_url[len(_WATCH_URL_PREFIX):] or None
+    return None
+
+
 def get_video_info(url: str, log_callback=None) -> Dict:
     """
     Obtiene información del video sin descargarlo.
     
+    El resultado se guarda por video_id en memoria y en la base de datos (durante
+    VIDEO_INFO_TTL_DAYS), de forma que validar la URL, comprobar si ya existe y
+    extraer metadatos no consulten YouTube varias veces para el mismo video.
+    
+    Args:
+        url: URL del video de YouTube
+        log_callback: Función opcional para logging (recibe un string). Si es None, usa print()
+    
+    Returns:
+        Diccionario con información del video o {} si hay error
+    """
+    video_id = _extract_video_id(url)
+    if not video_id:
+        return _fetch_video_info(url, log_callback)
+    
+    info = _VIDEO_INFO_MEMO.get(video_id)
+    if info is None:
+        info = db.get_cached_video_info(video_id, max_age_days=VIDEO_INFO_TTL_DAYS)
+        if info is None:
+            info = _fetch_video_info(url, log_callback)
+            if not info:
+                return info
+            info = {key: value for key, value in info.items() if key not in _VIDEO_INFO_UNCACHED_KEYS}
+            db.set_cached_video_info(video_id, info)
+        if len(_VIDEO_INFO_MEMO) >= VIDEO_INFO_MEMO_SIZE:
+            _VIDEO_INFO_MEMO.clear()
+        _VIDEO_INFO_MEMO[video_id] = info
+    
+    # Copia: quien llama puede modificar el diccionario
+    return dict(info)
+
+
+class _DiscardLogger:
+    """Logger para yt-dlp que descarta todos los mensajes."""
+    
+    def debug(self, msg):
+        pass
+    
+    info = warning = error = debug
+
+
+class _CaptureLogger:
+    """
+    Logger para yt-dlp que guarda advertencias y errores en memoria.
+    
+    Sustituye a redirigir sys.stderr, que es global y se pisa entre threads:
+    cada llamada usa su propio logger y solo ve sus mensajes.
+    """
+    
+    def __init__(self):
+        self.lines = []
+    
+    def debug(self, msg):
+        pass
+    
+    info = debug
+    
+    def warning(self, msg):
+        self.lines.append(f"WARNING: {msg}")
+    
+    def error(self, msg):
+        # yt-dlp ya antepone "ERROR:" a los errores
+        self.lines.append(msg)
+    
+    def getvalue(self) -> str:
+        return '\n'.join(self.lines)
+
+
+# yt-dlp lee el archivo de cookies la primera vez que lo necesita y lo reescribe entero
+# al cerrar; varias descargas y consultas en paralelo no deben leerlo ni escribirlo a la vez
+_COOKIES_LOCK = threading.Lock()
+
+
+def create_ydl(opts: Dict) -> 'yt_dlp.YoutubeDL':
+    """Crea un YoutubeDL cargando su archivo de cookies (si lo hay) bajo _COOKIES_LOCK."""
+    ydl = yt_dlp.YoutubeDL(opts)
+    if opts.get('cookiefile'):
+        with _COOKIES_LOCK:
+            ydl.cookiejar
+    return ydl
+
+
+def close_ydl(ydl: 'yt_dlp.YoutubeDL'):
+    """Cierra un YoutubeDL de create_ydl; el guardado de cookies se hace bajo _COOKIES_LOCK."""
+    with _COOKIES_LOCK:
+        ydl.close()
+
+
+@contextlib.contextmanager
+def ydl_session(opts: Dict):
+    """Equivalente a `with yt_dlp.YoutubeDL(opts) as ydl` con las cookies protegidas por _COOKIES_LOCK."""
+    ydl = create_ydl(opts)
+    try:
+        yield ydl
+    finally:
+        close_ydl(ydl)
+
+
+# Instancias de YoutubeDL reutilizables, por thread (YoutubeDL no es seguro entre threads)
+_YDL_LOCAL = threading.local()
+
+
+def _reusable_ydl(opts: Dict) -> 'yt_dlp.YoutubeDL':
+    """
+    Devuelve una instancia de YoutubeDL para estas opciones, reutilizada entre llamadas
+    del mismo thread. Crear un YoutubeDL registra todos los extractores (~80 ms), lo que
+    se nota al consultar la información de muchos videos seguidos.
+    
+    Las opciones deben ser datos simples (sin hooks). Los mensajes de yt-dlp se
+    descartan salvo que quien llama sustituya temporalmente params['logger'].
+    
+    Estas instancias nunca guardan sus cookies (no se cierran): su copia en memoria
+    sobrescribiría un cookies.txt exportado de nuevo. Si el archivo cambia, se crea
+    otra instancia que lo vuelve a leer.
+    """
+    instances = getattr(_YDL_LOCAL, 'instances', None)
+    if instances is None:
+        instances = _YDL_LOCAL.instances = {}
+    key = json.dumps(opts, sort_keys=True)
+    cookies_version = None
+    if opts.get('cookiefile'):
+        try:
+            stat = os.stat(opts['cookiefile'])
+            cookies_version = (stat.st_size, stat.st_mtime_ns)
+        except OSError:
+            pass
+    cached = instances.get(key)
+    if cached is None or cached[0] != cookies_version:
+        cached = instances[key] = (cookies_version, create_ydl({**opts, 'logger': _DiscardLogger()}))
+    return cached[1]
+
+
+def _fetch_video_info(url: str, log_callback=None) -> Dict:
+    """
+    Obtiene información del video consultando YouTube con yt-dlp.
+    
     Args:
         url: URL del video de YouTube
         log_callback: Función opcional para logging (recibe un string). Si es None, usa print()
@@ -1152,21 +1529,21 @@ def get_video_info(url: str, log_callback=None) -> Dict:
     # Añadir cookies si están disponibles
     cookies_file = get_cookies_file()
     
-    # Función auxiliar: extrae información y captura stderr para poder loguearlo
+    # Función auxiliar: extrae información y captura los mensajes de yt-dlp para poder loguearlos.
+    # Se usa un logger propio de la llamada (no sys.stderr, que comparten todos los threads);
+    # las instancias de YoutubeDL son de un solo thread, así que cambiar params es seguro.
     def extract_with_captured_stderr(ydl_instance, url):
         """Extrae información y devuelve (info, error, stderr_text)."""
-        import sys
-        import io
-        old_stderr = sys.stderr
-        buf = io.StringIO()
-        sys.stderr = buf
+        capture = _CaptureLogger()
+        old_logger = ydl_instance.params.get('logger')
+        ydl_instance.params['logger'] = capture
         try:
             info = ydl_instance.extract_info(url, download=False)
-            return info, None, buf.getvalue()
+            return info, None, capture.getvalue()
         except Exception as e:
-            return None, e, buf.getvalue()
+            return None, e, capture.getvalue()
         finally:
-            sys.stderr = old_stderr
+            ydl_instance.params['logger'] = old_logger
     
     # 1) Intentar primero con extract_flat (sin selector de formato) para evitar "Requested format is not available"
     #    en lyric videos, Music, etc. Solo obtenemos id, title, url; el resto se rellena por defecto.
@@ -1187,17 +1564,17 @@ def get_video_info(url: str, log_callback=None) -> Dict:
         log(f"   ⚠️  No se encontraron cookies")
     
     log(f"   🔄 Intentando primero modo básico (extract_flat, sin formato)...")
-    with yt_dlp.YoutubeDL(opts_flat) as ydl_flat:
-        info_flat, err_flat, _ = extract_with_captured_stderr(ydl_flat, url)
-        if info_flat and info_flat.get('id') and info_flat.get('title'):
-            elapsed = time.time() - start_time
-            log(f"   ✅ Información básica obtenida en {elapsed:.2f}s (modo plano)")
-            log(f"      Video ID: {info_flat.get('id')}")
-            log(f"      Título: {info_flat.get('title')}")
-            # Rellenar campos que extract_flat puede no devolver (el resto del código usa .get() con defaults)
-            if not info_flat.get('description'):
-                info_flat['description'] = ''
-            return info_flat
+    ydl_flat = _reusable_ydl(opts_flat)
+    info_flat, err_flat, _ = extract_with_captured_stderr(ydl_flat, url)
+    if info_flat and info_flat.get('id') and info_flat.get('title'):
+        elapsed = time.time() - start_time
+        log(f"   ✅ Información básica obtenida en {elapsed:.2f}s (modo plano)")
+        log(f"      Video ID: {info_flat.get('id')}")
+        log(f"      Título: {info_flat.get('title')}")
+        # Rellenar campos que extract_flat puede no devolver (el resto del código usa .get() con defaults)
+        if not info_flat.get('description'):
+            info_flat['description'] = ''
+        return info_flat
     
     if err_flat:
         log(f"   📋 Modo básico falló: {err_flat}")
@@ -1217,7 +1594,7 @@ def get_video_info(url: str, log_callback=None) -> Dict:
         ydl_opts['cookiefile'] = cookies_file
     
     log(f"   🔄 Extrayendo información completa (formato: bestaudio/best/worst)...")
-    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+    with ydl_session(ydl_opts) as ydl:
         try:
             info, error, stderr_capture = extract_with_captured_stderr(ydl, url)
             
@@ -1260,7 +1637,7 @@ def get_video_info(url: str, log_callback=None) -> Dict:
                 if cookies_file:
                     ydl_opts_retry['cookiefile'] = cookies_file
                 log(f"   🔄 Reintento 1/2: extract_flat=True...")
-                with yt_dlp.YoutubeDL(ydl_opts_retry) as ydl_retry:
+                with ydl_session(ydl_opts_retry) as ydl_retry:
                     info, err_retry, stderr_retry = extract_with_captured_stderr(ydl_retry, url)
                     if info and info.get('id') and info.get('title'):
                         if not info.get('description'):
@@ -1276,7 +1653,7 @@ def get_video_info(url: str, log_callback=None) -> Dict:
                     'ignoreerrors': True,
                     'extractor_args': youtube_extractor_args,
                 }
-                with yt_dlp.YoutubeDL(ydl_opts_retry_2) as ydl_retry_2:
+                with ydl_session(ydl_opts_retry_2) as ydl_retry_2:
                     info, _, _ = extract_with_captured_stderr(ydl_retry_2, url)
                     if info and info.get('id') and info.get('title'):
                         if not info.get('description'):
@@ -1308,7 +1685,7 @@ def get_video_info(url: str, log_callback=None) -> Dict:
                         ydl_opts_retry['cookiefile'] = cookies_file
                     
                     log(f"   🔄 Reintento 1/2: extract_flat=True (sin selector de formato)...")
-                    with yt_dlp.YoutubeDL(ydl_opts_retry) as ydl_retry:
+                    with ydl_session(ydl_opts_retry) as ydl_retry:
                         info, err_retry, stderr_retry = extract_with_captured_stderr(ydl_retry, url)
                         if info:
                             log(f"   ✅ Información básica obtenida (modo plano)")
@@ -1331,7 +1708,7 @@ def get_video_info(url: str, log_callback=None) -> Dict:
                         'ignoreerrors': True,
                     }
                     log(f"   🔄 Reintento 2/2: SIN cookies...")
-                    with yt_dlp.YoutubeDL(ydl_opts_retry_2) as ydl_retry_2:
+                    with ydl_session(ydl_opts_retry_2) as ydl_retry_2:
                         info, err_retry2, stderr_retry2 = extract_with_captured_stderr(ydl_retry_2, url)
                         if info:
                             log(f"   ✅ Información básica obtenida (sin cookies)")
@@ -1375,15 +1752,16 @@ def get_video_info(url: str, log_callback=None) -> Dict:
 def sanitize_filename(filename: str) -> str:
     """Limpia el nombre de archivo para que sea válido en el sistema de archivos."""
     # Remover caracteres no permitidos
-    filename = re.sub(r'[<>:"/\\|?*]', '', filename)
+    filename = _INVALID_FILENAME_CHARS_RE.sub('', filename)
     # Reemplazar espacios múltiples por uno solo
-    filename = re.sub(r'\s+', ' ', filename)
+    filename = _WHITESPACE_RUN_RE.sub(' ', filename)
     # Limitar longitud
     if len(filename) > 200:
         filename = filename[:200]
     return filename.strip()
 
 
+@functools.lru_cache(maxsize=4096)
 def clean_youtube_url(url: str) -> str:
     """
     Limpia una URL de YouTube eliminando parámetros adicionales después de &.
@@ -1397,6 +1775,10 @@ def clean_youtube_url(url: str) -> str:
     if not url:
         return url
     
+    # URL ya limpia (el caso habitual): no hace falta parsearla
+    if _CLEAN_YT_URL_RE.fullmatch(url):
+        return url
+    
     # Parsear la URL
     parsed = urllib.parse.urlparse(url)
     
@@ -1424,7 +1806,8 @@ def clean_youtube_url(url: str) -> str:
 
 
 def check_file_exists(video_id: Optional[str] = None, artist: Optional[str] = None, 
-                     title: Optional[str] = None, base_folder: str = None) -> Optional[Dict]:
+                     title: Optional[str] = None, base_folder: str = None,
+                     songs_by_id: Optional[Dict[str, Dict]] = None) -> Optional[Dict]:
     """
     Verifica si una canción ya existe en la base de datos.
     
@@ -1433,27 +1816,33 @@ def check_file_exists(video_id: Optional[str] = None, artist: Optional[str] = No
         artist: Nombre del artista
         title: Título de la canción
         base_folder: (deprecated, se mantiene por compatibilidad)
+        songs_by_id: Canciones ya obtenidas con db.get_songs_by_video_ids(); si se
+                     pasa, el video_id se busca aquí en lugar de consultar la BD
     
     Returns:
         Diccionario con los datos de la canción si existe, None si no existe.
     """
+    missing_path = None
     if video_id:
-        song = db.get_song_by_video_id(video_id)
+        if songs_by_id is not None:
+            song = songs_by_id.get(video_id)
+        else:
+            song = db.get_song_by_video_id(video_id)
         if song:
             # Verificar que el archivo realmente existe
-            file_path = Path(song['file_path'])
-            if file_path.exists():
+            if os.path.exists(song['file_path']):
                 return song
             else:
                 # El archivo fue eliminado, actualizar BD
                 print(f"⚠️  Archivo en BD no existe: {song['file_path']}")
                 # Opcional: eliminar de BD o marcar como eliminado
+                missing_path = song['file_path']
     
     if artist and title:
         songs = db.find_song(artist=artist, title=title)
         for song in songs:
-            file_path = Path(song['file_path'])
-            if file_path.exists():
+            # La canción encontrada por video_id suele volver a aparecer: no comprobarla otra vez
+            if song['file_path'] != missing_path and os.path.exists(song['file_path']):
                 return song
     
     return None
@@ -1536,21 +1925,17 @@ def download_audio(url: str, output_path: str, metadata: Dict, progress_callback
             cookies_label = "con cookies" if cookie_file else "sin cookies"
             print(f"   📥 Intentando formato ({i+1}/{len(format_attempts)}): {fmt} [{cookies_label}]")
             
-            # Suprimir stderr durante la descarga pero capturarlo para logs si falla
-            import sys
-            import io
-            old_stderr = sys.stderr
-            stderr_buf = io.StringIO()
-            sys.stderr = stderr_buf
+            # Suprimir los mensajes de yt-dlp durante la descarga pero guardarlos para logs si falla.
+            # Logger propio de este intento: sys.stderr es global y hay varias descargas en paralelo
+            capture = _CaptureLogger()
+            ydl_opts['logger'] = capture
             
             try:
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                with ydl_session(ydl_opts) as ydl:
                     ydl.download([url])
-                sys.stderr = old_stderr
                 return True
             except Exception as download_error:
-                stderr_output = stderr_buf.getvalue()
-                sys.stderr = old_stderr
+                stderr_output = capture.getvalue()
                 
                 last_error = download_error
                 error_str = str(download_error)
@@ -1594,92 +1979,200 @@ def download_audio(url: str, output_path: str, metadata: Dict, progress_callback
     return False
 
 
-def check_audio_volume(file_path: str) -> Optional[float]:
+@functools.lru_cache(maxsize=None)
+def _which(command: str) -> Optional[str]:
+    """shutil.which con caché: los programas externos no cambian durante la ejecución."""
+    return shutil.which(command)
+
+
+def _iter_ffmpeg_stderr(cmd, timeout: float):
     """
-    Verifica el volumen promedio del archivo de audio usando ffmpeg.
+    Ejecuta ffmpeg y va devolviendo su salida de errores línea a línea, sin
+    acumularla en memoria. Si el consumidor deja de iterar (o se supera el
+    timeout) el proceso se termina.
+    """
+    process = subprocess.Popen(
+        cmd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors='replace'
+    )
+    timer = threading.Timer(timeout, process.kill)
+    timer.start()
+    try:
+        for line in process.stderr:
+            yield line
+    finally:
+        timer.cancel()
+        if process.poll() is None:
+            process.kill()
+        process.stderr.close()
+        process.wait()
+
+
+def _measure_loudness(file_path: str, start: Optional[float] = None,
+                      duration: Optional[float] = None) -> Optional[Dict]:
+    """
+    Mide la sonoridad (EBU R128) con el filtro loudnorm de ffmpeg.
+    
+    Args:
+        file_path: Ruta al archivo de audio
+        start: Segundo desde el que medir (None = desde el principio)
+        duration: Segundos a medir (None = hasta el final)
     
     Returns:
-        Volumen promedio en dB (LUFS) o None si hay error.
-        Valores típicos: -23.0 LUFS (estándar EBU R128), más bajo = más silencioso
+        Diccionario JSON de loudnorm (input_i, input_tp, input_lra, input_thresh,
+        target_offset...) o None si hay error
     """
-    if not shutil.which('ffmpeg'):
+    cmd = ['ffmpeg']
+    # Antes de -i: ffmpeg salta directamente al punto pedido sin decodificar lo anterior
+    if start is not None:
+        cmd += ['-ss', f'{start:.1f}']
+    if duration is not None:
+        cmd += ['-t', f'{duration:.1f}']
+    cmd += [
+        '-i', file_path,
+        '-af', 'loudnorm=I=-23.0:TP=-2.0:LRA=7.0:print_format=json',
+        '-f', 'null',
+        '-'
+    ]
+    
+    # El bloque JSON de loudnorm llega al final: acumular solo sus líneas
+    json_lines = []
+    depth = 0
+    for line in _iter_ffmpeg_stderr(cmd, timeout=60):
+        stripped = line.strip()
+        if not json_lines and not stripped.startswith('{'):
+            continue
+        json_lines.append(line)
+        depth += stripped.count('{') - stripped.count('}')
+        if depth <= 0:
+            break
+    
+    if not json_lines:
         return None
+    return json.loads(''.join(json_lines))
+
+
+def _measure_mean_volume(file_path: str) -> Optional[float]:
+    """Volumen medio en dB según el filtro volumedetect de ffmpeg (método alternativo)."""
+    cmd = [
+        'ffmpeg',
+        '-i', file_path,
+        '-af', 'volumedetect',
+        '-f', 'null',
+        '-'
+    ]
+    
+    # Buscar mean_volume en la salida, línea a línea
+    for line in _iter_ffmpeg_stderr(cmd, timeout=60):
+        match = _MEAN_VOLUME_RE.search(line)
+        if match:
+            return float(match.group(1))
+    return None
+
+
+def _measure_volume(file_path: str) -> Tuple[Optional[float], Optional[Dict]]:
+    """
+    Mide el volumen con loudnorm y, si falla, con volumedetect.
+    
+    Returns:
+        (volumen en LUFS/dB o None, medición completa de loudnorm o None)
+    """
+    if not _which('ffmpeg'):
+        return None, None
     
     try:
         # Usar ffmpeg para analizar el volumen (EBU R128 loudness)
-        cmd = [
-            'ffmpeg',
-            '-i', file_path,
-            '-af', 'loudnorm=I=-23.0:TP=-2.0:LRA=7.0:print_format=json',
-            '-f', 'null',
-            '-'
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            stderr=subprocess.STDOUT,
-            timeout=60
-        )
-        
-        # Buscar el JSON en la salida
-        output = result.stdout + result.stderr
-        json_start = output.find('{')
-        if json_start != -1:
-            json_str = output[json_start:]
-            json_end = json_str.rfind('}') + 1
-            if json_end > 0:
-                data = json.loads(json_str[:json_end])
-                # Obtener el input_i (volumen promedio en LUFS)
-                input_i = data.get('input_i')
-                if input_i is not None:
-                    return float(input_i)
-    except (subprocess.TimeoutExpired, json.JSONDecodeError, ValueError, KeyError) as e:
+        data = _measure_loudness(file_path)
+        # Obtener el input_i (volumen promedio en LUFS)
+        if data and data.get('input_i') is not None:
+            return float(data['input_i']), data
+    except (OSError, json.JSONDecodeError, ValueError) as e:
         # Si falla, intentar método alternativo más simple
         pass
     
-    # Método alternativo: usar volumedetect
     try:
-        cmd = [
-            'ffmpeg',
-            '-i', file_path,
-            '-af', 'volumedetect',
-            '-f', 'null',
-            '-'
-        ]
-        
-        result = subprocess.run(
-            cmd,
-            capture_output=True,
-            text=True,
-            stderr=subprocess.STDOUT,
-            timeout=60
-        )
-        
-        output = result.stdout + result.stderr
-        # Buscar mean_volume en la salida
-        match = re.search(r'mean_volume:\s*([-\d.]+)\s*dB', output)
-        if match:
-            return float(match.group(1))
-    except (subprocess.TimeoutExpired, ValueError) as e:
-        pass
+        return _measure_mean_volume(file_path), None
+    except (OSError, ValueError) as e:
+        return None, None
+
+
+def _screen_loudness(file_path: str) -> Optional[float]:
+    """
+    Mide la sonoridad solo del fragmento central de LOUDNESS_SCREEN_SECONDS segundos.
     
+    Sirve para descartar rápido las pistas con volumen suficiente sin decodificar
+    el archivo entero. Devuelve None si la pista es corta (la medición completa ya
+    es barata) o si no se puede medir.
+    """
+    if not _which('ffmpeg'):
+        return None
+    try:
+        length = MP3(file_path).info.length
+    except Exception:
+        return None
+    if not length or length < 2 * LOUDNESS_SCREEN_SECONDS:
+        return None
+    
+    try:
+        data = _measure_loudness(file_path, start=(length - LOUDNESS_SCREEN_SECONDS) / 2,
+                                 duration=LOUDNESS_SCREEN_SECONDS)
+        if data and data.get('input_i') is not None:
+            volume = float(data['input_i'])
+            return volume if math.isfinite(volume) else None
+    except (OSError, json.JSONDecodeError, ValueError):
+        pass
     return None
 
 
-def normalize_audio_volume(file_path: str, target_lufs: float = -23.0) -> bool:
+def check_audio_volume(file_path: str) -> Optional[float]:
+    """
+    Verifica el volumen promedio del archivo de audio usando ffmpeg.
+    
+    Returns:
+        Volumen promedio en dB (LUFS) o None si hay error.
+        Valores típicos: -23.0 LUFS (estándar EBU R128), más bajo = más silencioso
+    """
+    return _measure_volume(file_path)[0]
+
+
+def _loudnorm_filter(target_lufs: float, measured: Optional[Dict] = None) -> str:
+    """
+    Construye el filtro loudnorm. Con la medición de una primera pasada se hace la
+    normalización en dos pasadas (lineal y más precisa) en lugar de la dinámica.
+    """
+    audio_filter = f'loudnorm=I={target_lufs}:TP=-2.0:LRA=7.0'
+    if not measured:
+        return audio_filter
+    try:
+        values = {key: float(measured[key]) for key in
+                  ('input_i', 'input_tp', 'input_lra', 'input_thresh', 'target_offset')}
+    except (KeyError, TypeError, ValueError):
+        return audio_filter
+    # Silencio total: loudnorm devuelve -inf y no admite esos valores medidos
+    if not all(math.isfinite(value) for value in values.values()):
+        return audio_filter
+    return (f"{audio_filter}:measured_I={values['input_i']}:measured_TP={values['input_tp']}"
+            f":measured_LRA={values['input_lra']}:measured_thresh={values['input_thresh']}"
+            f":offset={values['target_offset']}:linear=true")
+
+
+def normalize_audio_volume(file_path: str, target_lufs: float = -23.0,
+                           measured: Optional[Dict] = None) -> bool:
     """
     Normaliza el volumen del archivo de audio usando ffmpeg loudnorm.
     
     Args:
         file_path: Ruta al archivo MP3
         target_lufs: Nivel objetivo en LUFS (estándar EBU R128: -23.0)
+        measured: Medición previa de loudnorm (segunda pasada lineal) o None
     
     Returns:
         True si se normalizó correctamente, False en caso contrario
     """
-    if not shutil.which('ffmpeg'):
+    if not _which('ffmpeg'):
         print("   ⚠️  ffmpeg no está disponible, no se puede normalizar el volumen")
         return False
     
@@ -1694,7 +2187,7 @@ def normalize_audio_volume(file_path: str, target_lufs: float = -23.0) -> bool:
         cmd = [
             'ffmpeg',
             '-i', file_path,
-            '-af', f'loudnorm=I={target_lufs}:TP=-2.0:LRA=7.0',
+            '-af', _loudnorm_filter(target_lufs, measured),
             '-ar', '44100',  # Mantener sample rate
             '-b:a', '320k',  # Mantener bitrate
             '-y',  # Sobrescribir si existe
@@ -1708,15 +2201,16 @@ def normalize_audio_volume(file_path: str, target_lufs: float = -23.0) -> bool:
             timeout=300  # 5 minutos máximo
         )
         
-        if result.returncode == 0 and Path(temp_file).exists():
-            # Reemplazar el archivo original
-            Path(file_path).unlink()
-            Path(temp_file).rename(file_path)
-            return True
+        if result.returncode == 0:
+            # Reemplazar el archivo original (os.replace sobrescribe en una sola operación)
+            try:
+                os.replace(temp_file, file_path)
+                return True
+            except FileNotFoundError:
+                return False
         else:
             # Si falla, eliminar el archivo temporal
-            if Path(temp_file).exists():
-                Path(temp_file).unlink()
+            Path(temp_file).unlink(missing_ok=True)
             return False
             
     except subprocess.TimeoutExpired:
@@ -1741,7 +2235,15 @@ def check_and_normalize_audio(file_path: str, threshold_lufs: float = -26.0) ->
     """
     print("   🔊 Verificando volumen del audio...")
     
-    volume = check_audio_volume(file_path)
+    # Criba con el fragmento central: si ya tiene volumen suficiente no hace falta más
+    screen_volume = _screen_loudness(file_path)
+    if screen_volume is not None and screen_volume >= threshold_lufs:
+        print(f"   📊 Volumen actual: {screen_volume:.1f} LUFS (volumen adecuado, "
+              f"fragmento de {LOUDNESS_SCREEN_SECONDS} s)")
+        return True
+    
+    # Primera pasada completa: medir (la medición se reutiliza para normalizar sin volver a analizar)
+    volume, measurement = _measure_volume(file_path)
     
     if volume is None:
         print("   ⚠️  No se pudo verificar el volumen, normalizando de todas formas...")
@@ -1755,7 +2257,7 @@ def check_and_normalize_audio(file_path: str, threshold_lufs: float = -26.0) ->
     if volume < threshold_lufs:
         print(f" (por debajo del umbral de {threshold_lufs} LUFS)")
         print("   🔧 Normalizando volumen...")
-        if normalize_audio_volume(file_path):
+        if normalize_audio_volume(file_path, measured=measurement):
             print("   ✅ Volumen normalizado correctamente")
             return True
         else:
@@ -1781,12 +2283,25 @@ def save_rejected_video(video_id: str, url: Optional[str] = None,
     db.add_rejected_video(video_id, url=url, title=title, reason=reason)
 
 
+# Ruta de cookies encontrada por get_cookies_file (solo se guarda si existe)
+_COOKIES_FILE_CACHE: Dict[str, str] = {}
+
+
 def get_cookies_file() -> Optional[str]:
     """
     Busca y retorna la ruta al archivo de cookies de YouTube.
+    
+    Se consulta en cada acceso a YouTube, así que la ruta encontrada se guarda durante
+    toda la ejecución; si no hay cookies se vuelve a buscar en la siguiente llamada
+    (el archivo puede crearse después). get_cookies_file.cache_clear() olvida la ruta.
     """
+    cached = _COOKIES_FILE_CACHE.get('path')
+    if cached is not None:
+        return cached
+    
     cookies_file = os.getenv('YOUTUBE_COOKIES_FILE', '')
     if cookies_file and Path(cookies_file).exists():
+        _COOKIES_FILE_CACHE['path'] = cookies_file
         return cookies_file
     
     # Buscar en ubicaciones comunes
@@ -1796,11 +2311,15 @@ def get_cookies_file() -> Optional[str]:
     ]
     for cookie_path in possible_cookies:
         if cookie_path.exists():
-            return str(cookie_path)
+            _COOKIES_FILE_CACHE['path'] = str(cookie_path)
+            return _COOKIES_FILE_CACHE['path']
     
     return None
 
 
+get_cookies_file.cache_clear = _COOKIES_FILE_CACHE.clear
+
+
 def test_cookies() -> bool:
     """
     Prueba si las cookies funcionan correctamente accediendo a YouTube.
@@ -1853,12 +2372,19 @@ def test_cookies() -> bool:
     success_count = 0
     total_tests = len(test_urls)
     
+    def probe(url):
+        # Un YoutubeDL por thread: no es seguro compartirlo
+        with ydl_session(ydl_opts) as ydl:
+            return ydl.extract_info(url, download=False)
+    
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            for name, url in test_urls:
+        # Las pruebas son independientes: lanzarlas a la vez y mostrar los resultados en orden
+        with ThreadPoolExecutor(max_workers=total_tests) as executor:
+            futures = [executor.submit(probe, url) for _, url in test_urls]
+            for (name, url), future in zip(test_urls, futures):
                 try:
                     print(f"   Probando: {name}...", end=" ")
-                    info = ydl.extract_info(url, download=False)
+                    info = future.result()
                     
                     if info:
                         # Verificar si obtuvimos información útil
@@ -1942,7 +2468,7 @@ def get_user_playlists() -> list:
     playlists = []
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_session(ydl_opts) as ydl:
             # Intentar obtener información del usuario
             for url in urls_to_try:
                 try:
@@ -1982,6 +2508,8 @@ def find_liked_playlist_url() -> Optional[str]:
         'quiet': True,
         'no_warnings': True,
         'extract_flat': True,
+        # Solo hace falta saber si la playlist tiene entradas: no recorrer todas sus páginas
+        'playlistend': 1,
         'cookiefile': cookies_file,
     }
     
@@ -1994,7 +2522,7 @@ def find_liked_playlist_url() -> Optional[str]:
     ]
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_session(ydl_opts) as ydl:
             for url in urls_to_try:
                 try:
                     info = ydl.extract_info(url, download=False)
@@ -2047,7 +2575,7 @@ def list_user_playlists():
     ]
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_session(ydl_opts) as ydl:
             for name, url in test_urls:
                 try:
                     print(f"🔍 Probando: {name}...")
@@ -2165,7 +2693,7 @@ def get_liked_videos_from_url(playlist_url: str, limit: int = 10, start_index: i
     start_time = time.time()
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_session(ydl_opts) as ydl:
             print(f"[{time.strftime('%H:%M:%S')}] 🔍 Obteniendo videos de: {playlist_url} (límite: {limit}, desde índice: {start_index})")
             print(f"[{time.strftime('%H:%M:%S')}]    Llamando a ydl.extract_info...")
             info = ydl.extract_info(playlist_url, download=False)
@@ -2201,9 +2729,10 @@ def get_liked_videos_from_url(playlist_url: str, limit: int = 10, start_index: i
             if filtered_count > 0:
                 print(f"[{time.strftime('%H:%M:%S')}] ⚠️  Se omitieron {filtered_count} video(s) que no pudieron procesarse")
             
-            # Si no obtuvimos suficientes entradas, intentar sin extract_flat como fallback
-            # (aunque esto puede ser más lento y tener problemas con algunos videos)
-            if len(entries) < limit:
+            # Si se perdieron entradas en modo plano, intentar sin extract_flat como fallback
+            # (mucho más lento: extrae cada video completo). Si el modo plano no perdió
+            # ninguna, la playlist simplemente tiene menos de `limit` videos en ese rango
+            if filtered_count > 0 and len(entries) < limit:
                 print(f"⚠️  Solo se obtuvieron {len(entries)} entradas de {limit} solicitadas. Intentando sin extract_flat...")
                 ydl_opts_full = {
                     'quiet': True,
@@ -2215,7 +2744,7 @@ def get_liked_videos_from_url(playlist_url: str, limit: int = 10, start_index: i
                 if playlist_items:
                     ydl_opts_full['playlist_items'] = playlist_items
                 try:
-                    with yt_dlp.YoutubeDL(ydl_opts_full) as ydl_full:
+                    with ydl_session(ydl_opts_full) as ydl_full:
                         info_full = ydl_full.extract_info(playlist_url, download=False)
                         if info_full:
                             entries_full = info_full.get('entries', [])
@@ -2249,7 +2778,7 @@ def get_liked_videos_from_url(playlist_url: str, limit: int = 10, start_index: i
             
             # Si start_index > 1, las entradas devueltas deberían empezar desde start_index
             # pero por seguridad, tomamos solo las primeras 'limit' entradas
-            entries_to_process = entries[:limit]
+            entries_to_process = itertools.islice(entries, limit)
             
             for idx, entry in enumerate(entries_to_process, 1):
                 if len(videos) >= limit:
@@ -2321,9 +2850,11 @@ def get_liked_videos(limit: int = 10) -> list:
         "https://www.youtube.com/feed/liked",  # Feed de videos que te gustan
         "https://www.youtube.com/playlist?list=LL",  # Lista de "me gusta" (formato común)
     ])
+    # Sin repetir la URL encontrada (si falla, no tiene sentido volver a pedirla)
+    urls_to_try = list(dict.fromkeys(urls_to_try))
     
     try:
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+        with ydl_session(ydl_opts) as ydl:
             info = None
             last_error = None
             
@@ -2354,10 +2885,10 @@ def get_liked_videos(limit: int = 10) -> list:
                 print("   3. Usa --list-playlists para ver tus playlists disponibles")
                 return []
             
-            entries = info.get('entries', [])
+            entries = info.get('entries') or []
             videos = []
             
-            for entry in entries[:limit]:
+            for entry in itertools.islice(entries, limit):
                 if entry:
                     video_id = entry.get('id', '')
                     if not video_id:
@@ -2404,9 +2935,32 @@ def monitor_liked_videos(playlist_url: Optional[str] = None):
     
     print(f"✓ Se encontraron {len(liked_videos)} canciones en tu lista de 'me gusta'\n")
     
+    # Una sola consulta para todas las canciones ya registradas de la lista y otra para
+    # las rechazadas (se leen en cada ejecución, así que reflejan los cambios de otras ventanas)
+    liked_ids = [video['id'] for video in liked_videos]
+    known_songs = db.get_songs_by_video_ids(liked_ids)
+    rejected_ids = db.get_rejected_ids(liked_ids)
+    
     # Verificar cada canción
     videos_to_download = []
     
+    # Las comprobaciones locales (rechazada / ya descargada) son inmediatas; la información
+    # de YouTube del resto (operación costosa) se pide en paralelo y se muestra en orden
+    local_status = {}
+    info_futures = {}
+    info_executor = ThreadPoolExecutor(max_workers=VIDEO_INFO_WORKERS, thread_name_prefix='video-info')
+    for video in liked_videos:
+        video_id = video['id']
+        if video_id in rejected_ids:
+            local_status[video_id] = ('rejected', None)
+            continue
+        existing_song = check_file_exists(video_id=video_id, songs_by_id=known_songs)
+        if existing_song:
+            local_status[video_id] = ('downloaded', existing_song)
+        elif video_id not in info_futures:
+            info_futures[video_id] = info_executor.submit(_get_video_info_buffered, video['url'])
+    info_executor.shutdown(wait=False)
+    
     for i, video in enumerate(liked_videos, 1):
         video_id = video['id']
         title = video['title']
@@ -2414,22 +2968,23 @@ def monitor_liked_videos(playlist_url: Optional[str] = None):
         
         print(f"[{i}/{len(liked_videos)}] {title}")
         
+        status, existing_song = local_status.get(video_id, (None, None))
         # PRIMERO: Verificar si está rechazado (verificación rápida)
-        if is_rejected_video(video_id):
+        if status == 'rejected':
             print(f"   ⊘ Rechazada anteriormente (se omite)")
             print()
             continue
         
         # SEGUNDO: Verificar si ya está descargada por video_id (verificación rápida)
-        existing_song = check_file_exists(video_id=video_id)
-        if existing_song:
+        if status == 'downloaded':
             print(f"   ✓ Ya está descargada: {existing_song['file_path']}")
             print()
             continue
         
         # Solo si no está rechazado ni descargado, obtener información del video (operación costosa)
-        # Obtener información del video para extraer metadatos
-        video_info = get_video_info(url)
+        video_info, log_lines = info_futures[video_id].result()
+        for line in log_lines:
+            print(line)
         if not video_info:
             print(f"   ⚠️  No se pudo obtener información del video")
             print()
@@ -2465,167 +3020,277 @@ def monitor_liked_videos(playlist_url: Optional[str] = None):
     
     print(f"\n📥 Se encontraron {len(videos_to_download)} canciones no descargadas.\n")
     
-    for item in videos_to_download:
-        video = item['video']
-        video_info = item['video_info']
-        metadata = item['metadata']
+    # Las preguntas siguen siendo secuenciales; cada descarga aceptada (descarga,
+    # normalización, etiquetas y registro) es independiente y va a un pool
+    download_executor = ThreadPoolExecutor(max_workers=MAX_PARALLEL_DOWNLOADS, thread_name_prefix='download')
+    pending_downloads = []
+    
+    # Lo que imprimen las descargas (yt-dlp, normalización, etiquetas, registro) se guarda
+    # por descarga y se muestra entre preguntas, sin mezclarse con input()
+    original_stdout = sys.stdout
+    stdout_proxy = _ThreadBufferedStdout(original_stdout)
+    printed = set()
+    
+    def print_finished_downloads():
+        for future in pending_downloads:
+            if future.done() and future not in printed:
+                printed.add(future)
+                original_stdout.write(future.result()[1])
+        original_stdout.flush()
+    
+    sys.stdout = stdout_proxy
+    try:
+        for item in videos_to_download:
+            # Mostrar aquí, entre pregunta y pregunta, lo que hayan escrito las descargas terminadas
+            print_finished_downloads()
+            video = item['video']
+            video_info = item['video_info']
+            metadata = item['metadata']
         
-        title = video_info.get('title', video['title'])
-        artist = metadata.get('artist', 'Desconocido')
+            title = video_info.get('title', video['title'])
+            artist = metadata.get('artist', 'Desconocido')
         
-        # Mostrar portada al principio si está disponible
-        thumbnail_url = video_info.get('thumbnail')
-        if thumbnail_url:
-            print(f"\n🖼️  Portada disponible: {thumbnail_url}")
-            # Intentar mostrar la imagen si hay soporte en el terminal
-            try:
-                # Verificar si hay herramientas para mostrar imágenes
-                import subprocess
-                import shutil
-                
-                # Intentar con imgcat (iTerm2) o similar
-                if shutil.which('imgcat'):
-                    try:
-                        import urllib.request
-                        import tempfile
-                        with urllib.request.urlopen(thumbnail_url) as response:
-                            img_data = response.read()
-                            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
-                                tmp.write(img_data)
-                                tmp_path = tmp.name
-                            subprocess.run(['imgcat', tmp_path], check=False, capture_output=True)
-                            import os
-                            os.unlink(tmp_path)
-                    except:
-                        pass
-                # Intentar con w3mimgdisplay (si está disponible)
-                elif shutil.which('w3mimgdisplay'):
-                    try:
-                        import urllib.request
-                        import tempfile
-                        with urllib.request.urlopen(thumbnail_url) as response:
-                            img_data = response.read()
-                            with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
-                                tmp.write(img_data)
-                                tmp_path = tmp.name
-                            subprocess.run(['w3mimgdisplay', tmp_path], check=False, capture_output=True)
-                            import os
-                            os.unlink(tmp_path)
-                    except:
-                        pass
-            except:
-                pass  # Si no se puede mostrar, continuar sin error
+            # Mostrar portada al principio si está disponible
+            thumbnail_url = video_info.get('thumbnail')
+            if thumbnail_url:
+                print(f"\n🖼️  Portada disponible: {thumbnail_url}")
+                # Intentar mostrar la imagen si hay soporte en el terminal
+                try:
+                    # Intentar con imgcat (iTerm2) o similar
+                    if _which('imgcat'):
+                        try:
+                            import tempfile
+                            img_data = fetch_thumbnail(thumbnail_url)
+                            if img_data:
+                                with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
+                                    tmp.write(img_data)
+                                    tmp_path = tmp.name
+                                subprocess.run(['imgcat', tmp_path], check=False, capture_output=True)
+                                os.unlink(tmp_path)
+                        except (OSError, ValueError):
+                            pass
+                    # Intentar con w3mimgdisplay (si está disponible)
+                    elif _which('w3mimgdisplay'):
+                        try:
+                            import tempfile
+                            img_data = fetch_thumbnail(thumbnail_url)
+                            if img_data:
+                                with tempfile.NamedTemporaryFile(suffix='.jpg', delete=False) as tmp:
+                                    tmp.write(img_data)
+                                    tmp_path = tmp.name
+                                subprocess.run(['w3mimgdisplay', tmp_path], check=False, capture_output=True)
+                                os.unlink(tmp_path)
+                        except (OSError, ValueError):
+                            pass
+                except Exception:
+                    pass  # Si no se puede mostrar, continuar sin error
         
-        print(f"\n🎵 {title}")
-        if artist != 'Desconocido':
-            print(f"   Artista: {artist}")
+            print(f"\n🎵 {title}")
+            if artist != 'Desconocido':
+                print(f"   Artista: {artist}")
         
-        while True:
-            response = input("   ¿Quieres descargarla? (s/n/skip): ").strip().lower()
+            while True:
+                response = input("   ¿Quieres descargarla? (s/n/skip): ").strip().lower()
             
-            if response == 's' or response == 'si' or response == 'sí':
-                # Descargar la canción
-                print(f"\n📥 Descargando: {title}")
-                url = video['url']
+                if response == 's' or response == 'si' or response == 'sí':
+                    # Descargar la canción
+                    print(f"\n📥 Descargando: {title}")
                 
-                # Verificar si el archivo ya existe (por si acaso)
-                existing_song = check_file_exists(
-                    video_id=video['id'],
-                    artist=metadata.get('artist'),
-                    title=metadata.get('title', title)
-                )
+                    # Verificar si el archivo ya existe (por si acaso)
+                    existing_song = check_file_exists(
+                        video_id=video['id'],
+                        artist=metadata.get('artist'),
+                        title=metadata.get('title', title)
+                    )
                 
-                if existing_song:
-                    print(f"⚠️  El archivo ya existe: {existing_song['file_path']}")
-                    continue
+                    if existing_song:
+                        print(f"⚠️  El archivo ya existe: {existing_song['file_path']}")
+                        continue
                 
-                # Si no hay género, intentar detectarlo online
-                if not metadata.get('genre') and metadata.get('artist'):
-                    detected_genre = detect_genre_online(
-                        metadata.get('artist'), 
-                        metadata.get('title', title),
-                        video_info=video_info,
-                        title=title,
-                        description=video_info.get('description', '')
-                    )
-                    if detected_genre:
-                        metadata['genre'] = detected_genre
-                    else:
-                        user_genre = input("   ¿Qué género es esta canción? (deja vacío para 'Sin Clasificar'): ").strip()
-                        metadata['genre'] = user_genre if user_genre else 'Sin Clasificar'
+                    # Si no hay género, intentar detectarlo online
+                    if not metadata.get('genre') and metadata.get('artist'):
+                        detected_genre = detect_genre_online(
+                            metadata.get('artist'), 
+                            metadata.get('title', title),
+                            video_info=video_info,
+                            title=title,
+                            description=video_info.get('description', '')
+                        )
+                        if detected_genre:
+                            metadata['genre'] = detected_genre
+                        else:
+                            user_genre = input("   ¿Qué género es esta canción? (deja vacío para 'Sin Clasificar'): ").strip()
+                            metadata['genre'] = user_genre if user_genre else 'Sin Clasificar'
                 
-                # Si no hay año, preguntar o usar año actual
-                if not metadata.get('year'):
-                    print("   ⚠️  No se pudo detectar el año desde los metadatos de YouTube.")
-                    user_year = input("   ¿En qué año se publicó? (deja vacío para usar año actual): ").strip()
-                    if user_year:
-                        metadata['year'] = user_year
+                    # Si no hay año, preguntar o usar año actual
+                    if not metadata.get('year'):
+                        print("   ⚠️  No se pudo detectar el año desde los metadatos de YouTube.")
+                        user_year = input("   ¿En qué año se publicó? (deja vacío para usar año actual): ").strip()
+                        if user_year:
+                            metadata['year'] = user_year
+                        else:
+                            metadata['year'] = str(datetime.now().year)
                     else:
-                        metadata['year'] = str(datetime.now().year)
-                else:
-                    print(f"   📅 Año detectado desde metadatos de YouTube: {metadata.get('year')}")
+                        print(f"   📅 Año detectado desde metadatos de YouTube: {metadata.get('year')}")
                 
-                # Obtener carpeta de salida
-                output_folder = get_output_folder(MUSIC_FOLDER, metadata.get('genre'), metadata.get('year'))
+                    # Obtener carpeta de salida
+                    output_folder = get_output_folder(MUSIC_FOLDER, metadata.get('genre'), metadata.get('year'))
                 
-                # Crear nombre de archivo
-                if metadata.get('artist'):
-                    filename = f"{metadata['artist']} - {metadata['title']}"
-                else:
-                    filename = metadata['title']
+                    # Crear nombre de archivo
+                    if metadata.get('artist'):
+                        filename = f"{metadata['artist']} - {metadata['title']}"
+                    else:
+                        filename = metadata['title']
                 
-                filename = sanitize_filename(filename)
-                output_path = output_folder / filename
+                    filename = sanitize_filename(filename)
+                    output_path = output_folder / filename
                 
-                # Descargar
-                if download_audio(url, str(output_path), metadata):
-                    mp3_file = Path(str(output_path) + '.mp3')
-                    if not mp3_file.exists():
-                        mp3_files = list(output_folder.glob(f"{filename}*.mp3"))
-                        if mp3_files:
-                            mp3_file = mp3_files[0]
-                        else:
-                            print("   ❌ Error: No se encontró el archivo descargado.")
-                            break
-                    
-                    # Verificar y normalizar volumen si es necesario
-                    check_and_normalize_audio(str(mp3_file))
-                    
-                    # Si no se detectó género, intentar con Essentia (análisis de audio)
-                    if not metadata.get('genre') or metadata.get('genre', '').lower() in ['sin clasificar', 'unknown', '']:
-                        detected_genre = detect_genre_from_audio_file(str(mp3_file))
-                        if detected_genre:
-                            metadata['genre'] = detected_genre
-                    
-                    print("   🏷️  Añadiendo metadatos...")
-                    add_id3_tags(str(mp3_file), metadata, video_info)
-                    
-                    # Registrar en base de datos
-                    print("   💾 Registrando en base de datos...")
-                    register_song_in_db(video['id'], url, mp3_file, metadata, video_info, download_source='playlist')
-                    
-                    print(f"   ✅ Descarga completada: {mp3_file}")
-                else:
-                    print("   ❌ Error en la descarga.")
-                break
+                    # Descargar en segundo plano mientras se pregunta por la siguiente
+                    print(f"   ⏳ Descarga en cola ({len(pending_downloads) + 1})")
+                    pending_downloads.append(download_executor.submit(
+                        _download_liked_video_buffered, stdout_proxy,
+                        video, str(output_path), metadata, video_info
+                    ))
+                    break
                 
-            elif response == 'n' or response == 'no':
-                # Guardar como rechazada
-                save_rejected_video(video['id'], url=video['url'], title=title)
-                print(f"   ⊘ Guardada como rechazada (no se volverá a preguntar)")
-                break
+                elif response == 'n' or response == 'no':
+                    # Guardar como rechazada
+                    save_rejected_video(video['id'], url=video['url'], title=title)
+                    print(f"   ⊘ Guardada como rechazada (no se volverá a preguntar)")
+                    break
                 
-            elif response == 'skip' or response == '':
-                # Saltar esta canción (no guardar como rechazada)
-                print(f"   ⏭️  Saltada (se preguntará de nuevo la próxima vez)")
-                break
+                elif response == 'skip' or response == '':
+                    # Saltar esta canción (no guardar como rechazada)
+                    print(f"   ⏭️  Saltada (se preguntará de nuevo la próxima vez)")
+                    break
                 
-            else:
-                print("   Por favor, responde 's' (sí), 'n' (no) o 'skip' (saltar)")
+                else:
+                    print("   Por favor, responde 's' (sí), 'n' (no) o 'skip' (saltar)")
+        
+        # Esperar con el buffer aún activo: así la salida de cada descarga sale entera y en orden
+        if len(printed) < len(pending_downloads):
+            print(f"\n⏳ Esperando a {len(pending_downloads) - len(printed)} descargas en curso...")
+        failed = 0
+        for future in pending_downloads:
+            ok, log_text = future.result()
+            if future not in printed:
+                printed.add(future)
+                original_stdout.write(log_text)
+            if not ok:
+                failed += 1
+    finally:
+        sys.stdout = original_stdout
+    download_executor.shutdown()
+    if failed:
+        print(f"⚠️  {failed} descargas fallaron")
     
     print("\n✅ Monitoreo completado.")
 
 
+def _get_video_info_buffered(url: str) -> Tuple[Dict, List[str]]:
+    """
+    get_video_info para ejecutar en un thread: guarda los mensajes en lugar de
+    imprimirlos, para mostrarlos luego en orden sin mezclarse con los de otros videos.
+    """
+    log_lines = []
+    try:
+        video_info = get_video_info(url, log_callback=log_lines.append)
+    except Exception as e:
+        log_lines.append(f"   ❌ Error al obtener información: {e}")
+        video_info = {}
+    return video_info, log_lines
+
+
+class _ThreadBufferedStdout:
+    """
+    Sustituto de sys.stdout mientras monitor_liked_videos hace preguntas: lo que escribe
+    un thread que ha llamado a capture() se guarda en su propio buffer; lo demás (el
+    thread principal con sus preguntas) va directo a la salida original.
+    """
+    
+    def __init__(self, target):
+        self._target = target
+        self._local = threading.local()
+    
+    def capture(self) -> io.StringIO:
+        buf = self._local.buf = io.StringIO()
+        return buf
+    
+    def release(self):
+        self._local.buf = None
+    
+    def write(self, text):
+        buf = getattr(self._local, 'buf', None)
+        return (buf if buf is not None else self._target).write(text)
+    
+    def flush(self):
+        if getattr(self._local, 'buf', None) is None:
+            self._target.flush()
+    
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+
+def _download_liked_video_buffered(stdout_proxy: _ThreadBufferedStdout, video: Dict, output_path: str,
+                                   metadata: Dict, video_info: Dict) -> Tuple[bool, str]:
+    """
+    _download_liked_video para el pool de descargas: guarda lo que imprime en lugar de
+    mostrarlo, para que no se mezcle con las preguntas. Devuelve (éxito, texto impreso).
+    """
+    buf = stdout_proxy.capture()
+    try:
+        ok = _download_liked_video(video, output_path, metadata, video_info)
+    finally:
+        stdout_proxy.release()
+    return ok, buf.getvalue()
+
+
+def _download_liked_video(video: Dict, output_path: str, metadata: Dict, video_info: Dict) -> bool:
+    """
+    Descarga, normaliza, etiqueta y registra una canción aceptada al monitorear
+    la lista de 'me gusta'. Se ejecuta en un thread del pool de descargas.
+    
+    Returns:
+        True si la canción quedó descargada y registrada
+    """
+    url = video['url']
+    output_path = Path(output_path)
+    try:
+        if not download_audio(url, str(output_path), metadata):
+            print(f"   ❌ Error en la descarga: {output_path.name}")
+            return False
+        
+        mp3_file = Path(str(output_path) + '.mp3')
+        if not mp3_file.exists():
+            mp3_files = list(output_path.parent.glob(f"{output_path.name}*.mp3"))
+            if mp3_files:
+                mp3_file = mp3_files[0]
+            else:
+                print(f"   ❌ Error: No se encontró el archivo descargado: {output_path.name}")
+                return False
+        
+        # Verificar y normalizar volumen si es necesario
+        check_and_normalize_audio(str(mp3_file))
+        
+        # Si no se detectó género, intentar con Essentia (análisis de audio)
+        if not metadata.get('genre') or metadata.get('genre', '').lower() in ['sin clasificar', 'unknown', '']:
+            detected_genre = detect_genre_from_audio_file(str(mp3_file))
+            if detected_genre:
+                metadata['genre'] = detected_genre
+        
+        print(f"   🏷️  Añadiendo metadatos: {mp3_file.name}")
+        add_id3_tags(str(mp3_file), metadata, video_info)
+        
+        # Registrar en base de datos
+        register_song_in_db(video['id'], url, mp3_file, metadata, video_info, download_source='playlist')
+        
+        print(f"   ✅ Descarga completada: {mp3_file}")
+        return True
+    except Exception as e:
+        print(f"   ❌ Error procesando {output_path.name}: {e}")
+        return False
+
+
 def get_mp3_bitrate(file_path: Path) -> Optional[int]:
     """
     Extrae el bitrate de un archivo MP3 en kbps.
@@ -2818,7 +3483,7 @@ def add_id3_tags(file_path: str, metadata: Dict, video_info: Dict):
     """
     try:
         audio = MP3(file_path, ID3=ID3)
-    except:
+    except (MutagenError, OSError):
         audio = MP3(file_path)
         audio.add_tags()
     
@@ -2855,9 +3520,8 @@ def add_id3_tags(file_path: str, metadata: Dict, video_info: Dict):
     # Intentar añadir thumbnail como portada
     if video_info.get('thumbnail'):
         try:
-            import urllib.request
-            with urllib.request.urlopen(video_info['thumbnail']) as response:
-                image_data = response.read()
+            image_data = fetch_thumbnail(video_info['thumbnail'])
+            if image_data:
                 audio['APIC'] = APIC(
                     encoding=3,
                     mime='image/jpeg',
@@ -2865,8 +3529,8 @@ def add_id3_tags(file_path: str, metadata: Dict, video_info: Dict):
                     desc='Cover',
                     data=image_data
                 )
-        except:
-            pass  # Si falla, continuar sin portada
+        except (OSError, ValueError):
+            pass  # Si falla (red, HTTP o URL inválida), continuar sin portada
     
     audio.save()
 
@@ -2887,26 +3551,31 @@ def read_id3_tags(file_path: str) -> Dict[str, Optional[str]]:
     
     try:
         audio = MP3(file_path, ID3=ID3)
+        tags = audio.tags or {}
         
         # Leer título (TIT2)
-        if 'TIT2' in audio:
-            metadata['title'] = str(audio['TIT2'][0])
+        frame = tags.get('TIT2')
+        if frame is not None:
+            metadata['title'] = frame.text[0]
         
         # Leer artista (TPE1)
-        if 'TPE1' in audio:
-            metadata['artist'] = str(audio['TPE1'][0])
+        frame = tags.get('TPE1')
+        if frame is not None:
+            metadata['artist'] = frame.text[0]
         
-        # Leer año (TDRC)
-        if 'TDRC' in audio:
-            year_str = str(audio['TDRC'][0])
+        # Leer año (TDRC); el texto es un ID3TimeStamp, no un str
+        frame = tags.get('TDRC')
+        if frame is not None:
+            year_str = str(frame.text[0])
             # Extraer año si es una fecha completa
-            year_match = re.search(r'(\d{4})', year_str)
+            year_match = _FOUR_DIGITS_RE.search(year_str)
             if year_match:
                 metadata['year'] = year_match.group(1)
         
         # Leer género (TCON)
-        if 'TCON' in audio:
-            genre_text = str(audio['TCON'][0])
+        frame = tags.get('TCON')
+        if frame is not None:
+            genre_text = frame.text[0]
             # Limpiar el género si viene con formato estándar como "(17)House"
             if genre_text.startswith('(') and ')' in genre_text:
                 genre_text = genre_text.split(')', 1)[1].strip()
@@ -2921,7 +3590,8 @@ def read_id3_tags(file_path: str) -> Dict[str, Optional[str]]:
 
 def search_youtube_music_url(artist: str, title: str) -> Optional[str]:
     """
-    Busca la URL de YouTube Music para una canción usando DuckDuckGo.
+    Busca la URL de YouTube Music para una canción usando la búsqueda de YouTube Music
+    (vía yt-dlp, una sola petición en lugar de descargar y analizar una página de resultados).
     
     Args:
         artist: Nombre del artista
@@ -2930,46 +3600,95 @@ def search_youtube_music_url(artist: str, title: str) -> Optional[str]:
     Returns:
         URL de YouTube Music si se encuentra, None en caso contrario
     """
-    if not REQUESTS_AVAILABLE:
-        return None
-    
-    search_query = f"{artist} {title} site:music.youtube.com"
+    search_query = urllib.parse.quote_plus(f"{artist} {title}")
+    # La sección #songs devuelve solo canciones (no vídeos, álbumes ni playlists)
+    search_url = f"https://music.youtube.com/search?q={search_query}#songs"
     
     try:
-        # Buscar en DuckDuckGo
-        search_url = f"https://html.duckduckgo.com/html/?q={urllib.parse.quote(search_query)}"
-        
-        headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
-        
-        response = requests.get(search_url, headers=headers, timeout=10)
-        if response.status_code == 200:
-            content = response.text
-            
-            # Buscar URLs de YouTube Music en el contenido
-            # Patrón para encontrar URLs de music.youtube.com
-            pattern = r'https://music\.youtube\.com/watch\?v=[a-zA-Z0-9_-]+'
-            matches = re.findall(pattern, content)
-            
-            if matches:
-                # Devolver la primera URL encontrada
-                return matches[0]
-            
-            # También buscar enlaces que puedan contener la URL
-            # Buscar enlaces con href que apunten a music.youtube.com
-            href_pattern = r'href=["\'](https://music\.youtube\.com/[^"\']+)["\']'
-            href_matches = re.findall(href_pattern, content)
-            
-            if href_matches:
-                return href_matches[0]
-    
+        ydl = _reusable_ydl({
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'playlistend': 1,
+        })
+        info = ydl.extract_info(search_url, download=False) or {}
+        for entry in info.get('entries') or []:
+            video_id = entry.get('id') if entry else None
+            if video_id:
+                return f"https://music.youtube.com/watch?v={video_id}"
     except Exception:
         pass
     
     return None
 
 
+# ioctl de Linux que clona un archivo compartiendo bloques (btrfs, XFS, ...)
+_FICLONE = 0x40049409 if fcntl is not None and sys.platform.startswith('linux') else None
+
+
+def _id3_tags_match(file_tags: Dict[str, Optional[str]], metadata: Dict) -> bool:
+    """
+    Indica si add_id3_tags(..., video_info={}) no cambiaría nada: cada campo que
+    escribiría (los que tienen valor en metadata) ya está igual en file_tags.
+    """
+    for key in ('title', 'artist', 'year', 'genre'):
+        wanted = metadata.get(key)
+        if wanted and str(wanted).strip() != (file_tags.get(key) or ''):
+            return False
+    return True
+
+
+def get_imported_video_id(file_path) -> str:
+    """
+    Genera el video_id de un MP3 importado sin vídeo de YouTube asociado.
+    
+    Usa blake2b en lugar de hash(), que cambia en cada ejecución de Python: así el mismo
+    archivo tiene siempre el mismo ID y las reimportaciones se detectan como duplicadas.
+    """
+    file_hash = hashlib.blake2b(str(file_path).encode('utf-8'), digest_size=8).hexdigest()
+    return f"imported_{file_hash}"
+
+
+def _is_inside_folder(path: Path, folder: str) -> bool:
+    """Indica si path está dentro de folder (resolviendo enlaces y rutas relativas)."""
+    try:
+        Path(path).resolve().relative_to(Path(folder).resolve())
+        return True
+    except ValueError:
+        return False
+
+
+def _fast_copy(src: str, dst: str) -> None:
+    """
+    Copia un archivo como shutil.copy2, evitando pasar los datos por Python cuando se puede.
+    
+    Primero intenta un reflink (instantáneo en btrfs/XFS), después os.copy_file_range
+    (copia dentro del kernel, o en el servidor en NFS) y, si ninguno está disponible,
+    una copia con buffer de 1 MiB. Conserva fechas y permisos como copy2.
+    """
+    with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+        copied = False
+        if _FICLONE is not None:
+            try:
+                fcntl.ioctl(fdst.fileno(), _FICLONE, fsrc.fileno())
+                copied = True
+            except OSError:
+                pass  # Sin soporte de reflink o distinto sistema de archivos
+        if not copied and hasattr(os, 'copy_file_range'):
+            try:
+                while os.copy_file_range(fsrc.fileno(), fdst.fileno(), 1 << 30):
+                    pass
+                copied = True
+            except OSError:
+                # Empezar de cero con la copia normal
+                fsrc.seek(0)
+                fdst.seek(0)
+                fdst.truncate()
+        if not copied:
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+    shutil.copystat(src, dst)
+
+
 def process_imported_mp3(file_path: Path, base_folder: str, 
                          existing_metadata: Optional[Dict] = None,
                          video_info: Optional[Dict] = None,
@@ -3012,16 +3731,20 @@ def process_imported_mp3(file_path: Path, base_folder: str,
         
         # Verificar si el género ya fue detectado y es válido (viene en existing_metadata)
         # Si existing_metadata tiene un género válido (no genérico), usarlo
-        existing_genre = existing_metadata.get('genre', '').strip() if existing_metadata else ''
+        existing_genre = (existing_metadata.get('genre') or '').strip() if existing_metadata else ''
         genre_is_valid = (existing_genre and 
-                          existing_genre.lower() not in ['unknown', 'desconocido', 'sin clasificar', ''] and
+                          existing_genre.lower() not in _GENERIC_GENRES and
                           len(existing_genre) >= 2)
         
         # Si no hay género válido o el género es genérico/vacío, intentar detectarlo
-        current_genre = metadata.get('genre', '').strip()
+        current_genre = (metadata.get('genre') or '').strip()
+        audio_genre_future = None
         if not genre_is_valid and (not current_genre or 
-            current_genre.lower() in ['unknown', 'desconocido', 'sin clasificar', ''] or
+            current_genre.lower() in _GENERIC_GENRES or
             len(current_genre) < 2):
+            # Analizar el audio con Essentia en segundo plano mientras se consultan las fuentes online
+            audio_genre_future = start_audio_genre_detection(str(file_path))
+            
             # Intentar detectar género online si hay artista
             if metadata.get('artist'):
                 detected_genre = detect_genre_online(
@@ -3033,6 +3756,9 @@ def process_imported_mp3(file_path: Path, base_folder: str,
                 )
                 if detected_genre:
                     metadata['genre'] = detected_genre
+                    if audio_genre_future is not None:
+                        audio_genre_future.cancel()
+                        audio_genre_future = None
                 else:
                     metadata['genre'] = 'Sin Clasificar'
             else:
@@ -3051,9 +3777,9 @@ def process_imported_mp3(file_path: Path, base_folder: str,
         
         # ANTES de determinar la carpeta de destino, intentar usar Essentia si el género es genérico
         # Esto es especialmente útil cuando no hay artista
-        if (not metadata.get('genre') or 
-            metadata.get('genre', '').lower() in ['sin clasificar', 'unknown', 'desconocido', '']):
-            detected_genre = detect_genre_from_audio_file(str(file_path), log_callback=log_callback)
+        if (metadata.get('genre') or '').lower() in _GENERIC_GENRES:
+            detected_genre = detect_genre_from_audio_file(str(file_path), log_callback=log_callback,
+                                                          pending=audio_genre_future)
             if detected_genre:
                 metadata['genre'] = detected_genre
         
@@ -3071,39 +3797,19 @@ def process_imported_mp3(file_path: Path, base_folder: str,
         
         # Si el archivo ya está en la ubicación correcta, no copiarlo
         if file_path == new_file_path:
-            # Si aún no se detectó género o es genérico, intentar con Essentia una vez más
-            if (not metadata.get('genre') or 
-                metadata.get('genre', '').lower() in ['sin clasificar', 'unknown', 'desconocido', '']):
-                detected_genre = detect_genre_from_audio_file(str(file_path), log_callback=log_callback)
-                if detected_genre:
-                    metadata['genre'] = detected_genre
-                    # Si cambió el género, actualizar la carpeta de destino
-                    output_folder = get_output_folder(base_folder, metadata.get('genre'), metadata.get('year'))
-                    if file_path.parent != output_folder:
-                        # El archivo necesita moverse a la nueva carpeta
-                        new_filename = output_folder / file_path.name
-                        if not new_filename.exists():
-                            output_folder.mkdir(parents=True, exist_ok=True)
-                            shutil.move(str(file_path), str(new_filename))
-                            final_file_path = new_filename
-                        else:
-                            final_file_path = file_path
-                    else:
-                        final_file_path = file_path
-                else:
-                    final_file_path = file_path
-            else:
-                final_file_path = file_path
+            # Essentia ya analizó este mismo archivo antes de elegir la carpeta
+            final_file_path = file_path
             
-            # Actualizar metadatos siempre para asegurar que los ID3 tags estén actualizados
-            add_id3_tags(str(final_file_path), metadata, video_info or {})
+            # Actualizar los ID3 tags salvo que ya estén como se van a escribir (mutagen
+            # reescribe todo el bloque de etiquetas); con video_info también van álbum y portada
+            if video_info or not _id3_tags_match(read_id3_tags(str(final_file_path)), metadata):
+                add_id3_tags(str(final_file_path), metadata, video_info or {})
         else:
             # Verificar si el archivo ya existe exactamente (sin variaciones)
             if new_file_path.exists():
                 # El archivo ya existe, pero intentar actualizar metadatos si el género cambió
                 # Intentar usar Essentia si el género es genérico
-                if (not metadata.get('genre') or 
-                    metadata.get('genre', '').lower() in ['sin clasificar', 'unknown', 'desconocido', '']):
+                if (metadata.get('genre') or '').lower() in _GENERIC_GENRES:
                     detected_genre = detect_genre_from_audio_file(str(new_file_path), log_callback=log_callback)
                     if detected_genre:
                         metadata['genre'] = detected_genre
@@ -3114,34 +3820,22 @@ def process_imported_mp3(file_path: Path, base_folder: str,
             # Copiar el archivo a la nueva ubicación
             # Si ya existe un archivo con ese nombre, añadir número
             counter = 1
-            original_new_path = new_file_path
             while new_file_path.exists():
                 new_file_path = output_folder / f"{filename} ({counter}).mp3"
                 counter += 1
             
-            shutil.copy2(str(file_path), str(new_file_path))
-            
-            # Si no se detectó género o es genérico, intentar con Essentia
-            if (not metadata.get('genre') or 
-                metadata.get('genre', '').lower() in ['sin clasificar', 'unknown', 'desconocido', '']):
-                detected_genre = detect_genre_from_audio_file(str(new_file_path), log_callback=log_callback)
-                if detected_genre:
-                    metadata['genre'] = detected_genre
-                    # Si cambió el género, actualizar la carpeta de destino
-                    output_folder = get_output_folder(base_folder, metadata.get('genre'), metadata.get('year'))
-                    if new_file_path.parent != output_folder:
-                        # Copiar a la carpeta correcta según el nuevo género
-                        new_filename = output_folder / new_file_path.name
-                        if not new_filename.exists():
-                            output_folder.mkdir(parents=True, exist_ok=True)
-                            shutil.copy2(str(new_file_path), str(new_filename))
-                            # Eliminar el archivo de la ubicación anterior
-                            new_file_path.unlink()
-                            new_file_path = new_filename
-                        else:
-                            # Si ya existe en la nueva ubicación, eliminar la copia temporal
-                            new_file_path.unlink()
-                            return None
+            # Essentia ya analizó el archivo de origen antes de elegir la carpeta, así que
+            # el destino es definitivo: una sola copia (o un rename dentro de la biblioteca)
+            if _is_inside_folder(file_path, base_folder):
+                try:
+                    os.rename(file_path, new_file_path)
+                except OSError as e:
+                    if e.errno != errno.EXDEV:
+                        raise
+                    _fast_copy(str(file_path), str(new_file_path))
+                    file_path.unlink()
+            else:
+                _fast_copy(str(file_path), str(new_file_path))
             
             # Actualizar metadatos si hay video_info
             if video_info:
@@ -3167,9 +3861,7 @@ def process_imported_mp3(file_path: Path, base_folder: str,
             # Registrar en base de datos
             # Si no hay video_id, generar uno temporal o usar None
             if not video_id:
-                # Usar hash absoluto para evitar números negativos
-                file_hash = abs(hash(str(final_file_path)))
-                video_id = f"imported_{file_hash}"
+                video_id = get_imported_video_id(final_file_path)
             
             # Crear video_info mínimo si no existe
             if not video_info:
@@ -3202,8 +3894,22 @@ def process_imported_mp3(file_path: Path, base_folder: str,
         return False
 
 
+def _parse_cli_options(argv: List[str]) -> Dict[str, str]:
+    """
+    Recorre los argumentos una sola vez y devuelve {'--opcion': valor} para cada
+    '--opcion' seguida de un valor (si se repite, vale la primera aparición).
+    """
+    options = {}
+    for idx in range(1, len(argv) - 1):
+        if argv[idx].startswith('--'):
+            options.setdefault(argv[idx], argv[idx + 1])
+    return options
+
+
 def main():
     """Función principal."""
+    options = _parse_cli_options(sys.argv)
+    
     # Verificar si se quiere probar las cookies
     if len(sys.argv) >= 2 and sys.argv[1] == '--test-cookies':
         test_cookies()
@@ -3235,11 +3941,7 @@ def main():
     # Verificar si se quiere monitorear la lista de "me gusta"
     if len(sys.argv) >= 2 and sys.argv[1] == '--monitor-liked':
         # Verificar si se proporciona una URL de playlist
-        playlist_url = None
-        if '--playlist-url' in sys.argv:
-            idx = sys.argv.index('--playlist-url')
-            if idx + 1 < len(sys.argv):
-                playlist_url = sys.argv[idx + 1]
+        playlist_url = options.get('--playlist-url')
         
         monitor_liked_videos(playlist_url=playlist_url)
         return
@@ -3286,20 +3988,14 @@ def main():
     metadata = extract_metadata_from_title(title, description, video_info)
     
     # Permitir sobrescribir metadatos con argumentos de línea de comandos
-    if '--genre' in sys.argv:
-        idx = sys.argv.index('--genre')
-        if idx + 1 < len(sys.argv):
-            metadata['genre'] = sys.argv[idx + 1]
+    if '--genre' in options:
+        metadata['genre'] = options['--genre']
     
-    if '--artist' in sys.argv:
-        idx = sys.argv.index('--artist')
-        if idx + 1 < len(sys.argv):
-            metadata['artist'] = sys.argv[idx + 1]
+    if '--artist' in options:
+        metadata['artist'] = options['--artist']
     
-    if '--year' in sys.argv:
-        idx = sys.argv.index('--year')
-        if idx + 1 < len(sys.argv):
-            metadata['year'] = sys.argv[idx + 1]
+    if '--year' in options:
+        metadata['year'] = options['--year']
     
     # Si no hay género, intentar detectarlo online
     if not metadata.get('genre') and metadata.get('artist'):
@@ -3333,8 +4029,7 @@ def main():
     video_id = video_info.get('id', '')
     if not video_id:
         # Intentar extraer de la URL
-        import re
-        match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*', url)
+        match = _VIDEO_ID_IN_URL_RE.search(url)
         if match:
             video_id = match.group(1)
     
@@ -15,6 +15,11 @@ try:
 except ImportError:
     ESSENTIA_AVAILABLE = False
 
+# Effnet trabaja a 16 kHz; se analizan solo los 2 minutos centrales de la pista
+# (la inferencia es proporcional a la duración y las intros/outros aportan poco al género)
+EFFNET_SAMPLE_RATE = 16000
+EFFNET_EXCERPT_SECONDS = 120
+
 # Variables globales para el modelo (singleton)
 _model_path = None
 _json_path = None
@@ -136,9 +141,13 @@ def predict_genre_discogs(file_path: str) -> Optional[List[Tuple[str, float]]]:
         return None
 
     try:
-        # Cargar audio a 16kHz (requisito de Effnet)
-        loader = es.MonoLoader(filename=file_path, sampleRate=16000)
+        # Cargar audio a 16kHz (requisito de Effnet) y quedarse con el fragmento central
+        loader = es.MonoLoader(filename=file_path, sampleRate=EFFNET_SAMPLE_RATE)
         audio = loader()
+        excerpt_length = EFFNET_SAMPLE_RATE * EFFNET_EXCERPT_SECONDS
+        if len(audio) > excerpt_length:
+            start = (len(audio) - excerpt_length) // 2
+            audio = audio[start:start + excerpt_length]
 
         # Ejecutar predicción
         activations = predictor(audio)
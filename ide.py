@@ -40,7 +40,6 @@ from tkinter import ttk, scrolledtext, messagebox, simpledialog, filedialog
 # Importar PIL para manejar imágenes
 try:
     from PIL import Image, ImageTk
-    import urllib.request
     import io
     PIL_AVAILABLE = True
 except ImportError:
@@ -73,7 +72,8 @@ from download_youtube import (
     get_genre_from_description_deep, get_genre_from_lastfm, get_genre_from_musicbrainz,
     get_genre_from_web_search, get_genre_from_hashtags, get_genre_from_spotify_search,
     read_id3_tags, search_youtube_music_url, process_imported_mp3, get_decade_from_year,
-    detect_genre_from_audio_file
+    detect_genre_from_audio_file, fetch_thumbnail, get_imported_video_id,
+    _VIDEO_ID_IN_URL_RE
 )
 from download_quick import download_quick
 from query_db import show_statistics, search_songs
@@ -90,6 +90,10 @@ MUSIC_FOLDER = os.getenv('MUSIC_FOLDER', os.path.expanduser('~/Music'))
 SOFTWARE_NAME = "DJ_CUCHIDownloader"
 GITHUB_URL = "https://github.com/yocuchi/DJ_scripts"
 
+# Expresiones regulares compiladas una sola vez
+# video_id entre corchetes o paréntesis en el nombre de archivo: [VIDEO_ID] o (VIDEO_ID)
+_VIDEO_ID_IN_FILENAME_RE = re.compile(r'\[([a-zA-Z0-9_-]{11})\]|\(([a-zA-Z0-9_-]{11})\)')
+
 
 class MusicDownloaderGUI:
     """Interfaz gráfica para el gestor de descarga de música."""
@@ -1075,7 +1079,7 @@ class MusicDownloaderGUI:
                 
                 # Extraer video_id
                 video_id = None
-                match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*', url)
+                match = _VIDEO_ID_IN_URL_RE.search(url)
                 if match:
                     video_id = match.group(1)
                 
@@ -1288,8 +1292,7 @@ class MusicDownloaderGUI:
             # Extraer video_id
             video_id = video_info.get('id', '')
             if not video_id:
-                import re
-                match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*', url)
+                match = _VIDEO_ID_IN_URL_RE.search(url)
                 if match:
                     video_id = match.group(1)
             
@@ -2552,9 +2555,9 @@ class MusicDownloaderGUI:
                     if video_info and video_info.get('thumbnail') and PIL_AVAILABLE:
                         try:
                             thumbnail_url = video_info.get('thumbnail')
-                            # Descargar imagen
-                            with urllib.request.urlopen(thumbnail_url) as response:
-                                image_data = response.read()
+                            # Descargar imagen (sesión HTTP compartida: reutiliza la conexión)
+                            image_data = fetch_thumbnail(thumbnail_url)
+                            if image_data:
                                 image = Image.open(io.BytesIO(image_data))
                                 # Redimensionar a tamaño para thumbnail (480x270 para que coincida con el reproductor)
                                 image = image.resize((480, 270), Image.Resampling.LANCZOS)
@@ -2728,9 +2731,8 @@ class MusicDownloaderGUI:
     
     def show_embedded_video_in_thumbnail(self, video_id, video_url, video_title=""):
         """Muestra el video de YouTube embebido usando QWebEngineView en una ventana flotante."""
-        import re
         if not video_id:
-            video_id_match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*', video_url)
+            video_id_match = _VIDEO_ID_IN_URL_RE.search(video_url)
             if not video_id_match:
                 webbrowser.open(video_url)
                 return
@@ -2896,8 +2898,7 @@ class MusicDownloaderGUI:
     def show_embedded_video(self, video_url, video_title=""):
         """Muestra una ventana con el video de YouTube embebido (función legacy)."""
         # Redirigir a la nueva función si es posible
-        import re
-        video_id_match = re.search(r'(?:v=|\/)([0-9A-Za-z_-]{11}).*', video_url)
+        video_id_match = _VIDEO_ID_IN_URL_RE.search(video_url)
         if video_id_match:
             video_id = video_id_match.group(1)
             if video_id in self.thumbnail_labels:
@@ -3355,8 +3356,7 @@ class MusicDownloaderGUI:
                         filename = mp3_file.stem
                         
                         # Buscar video_id en formato [VIDEO_ID] o (VIDEO_ID)
-                        video_id_pattern = r'\[([a-zA-Z0-9_-]{11})\]|\(([a-zA-Z0-9_-]{11})\)'
-                        video_id_match = re.search(video_id_pattern, filename)
+                        video_id_match = _VIDEO_ID_IN_FILENAME_RE.search(filename)
                         
                         if video_id_match:
                             video_id = video_id_match.group(1) or video_id_match.group(2)
@@ -3445,7 +3445,7 @@ class MusicDownloaderGUI:
                         if not artist or not title:
                             if ' - ' in filename:
                                 # Limpiar el nombre del archivo removiendo el video_id si existe
-                                clean_filename = re.sub(r'\[([a-zA-Z0-9_-]{11})\]|\(([a-zA-Z0-9_-]{11})\)', '', filename).strip()
+                                clean_filename = _VIDEO_ID_IN_FILENAME_RE.sub('', filename).strip()
                                 if ' - ' in clean_filename:
                                     parts = clean_filename.split(' - ', 1)
                                     if not artist:
@@ -3459,7 +3459,7 @@ class MusicDownloaderGUI:
                             else:
                                 if not title:
                                     # Limpiar el nombre del archivo removiendo el video_id si existe
-                                    clean_filename = re.sub(r'\[([a-zA-Z0-9_-]{11})\]|\(([a-zA-Z0-9_-]{11})\)', '', filename).strip()
+                                    clean_filename = _VIDEO_ID_IN_FILENAME_RE.sub('', filename).strip()
                                     title = clean_filename
                                     existing_metadata['title'] = title
                                     self.import_log(f"  ✓ Título extraído del nombre: {title}")
@@ -3487,8 +3487,7 @@ class MusicDownloaderGUI:
                         # Detectar género si no existe
                         if not genre and artist:
                             # Generar un video_id temporal para usar la caché
-                            file_hash = abs(hash(str(mp3_file)))
-                            temp_video_id = f"imported_{file_hash}"
+                            temp_video_id = get_imported_video_id(mp3_file)
                             
                             # Verificar caché de género primero
                             cached_genre = db.get_cached_genre(temp_video_id)
@@ -175,8 +175,9 @@ class ProcessInterface:
             # Modo directo: importar y ejecutar
             try:
                 module = self._import_module('download_quick')
-                module['download_quick'](url)
-                return {'success': True, 'output': 'Descarga completada', 'error': ''}
+                if module['download_quick'](url):
+                    return {'success': True, 'output': 'Descarga completada', 'error': ''}
+                return {'success': False, 'output': '', 'error': 'La descarga rápida falló'}
             except Exception as e:
                 return {'success': False, 'output': '', 'error': str(e)}
         else: